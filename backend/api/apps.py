@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
 
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .connections import check_connections, release_connections
+
+        request_started.connect(check_connections)
+        request_finished.connect(release_connections)
@@ -0,0 +1,181 @@
+"""ASGI-обертка над WSGI-обработчиком Django.
+
+Django 2.2 не умеет асинхронных вьюх, поэтому асинхронна только работа
+с сетью: тело запроса принимается и ответ отдается в цикле событий, а
+вьюха с синхронным ORM выполняется в ограниченном пуле потоков. Медленный
+клиент, который долго загружает картинку рецепта или скачивает список
+покупок, не держит поток и соединение с базой, пока передаются данные.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections
+from django.http import HttpResponse
+from food import images
+
+_END = object()
+
+
+class BodyTooLarge(Exception):
+    """Тело запроса больше ASGI_MAX_BODY_SIZE."""
+
+
+def start_response(status, headers, exc_info=None):
+    # Статус и заголовки берутся из самого ответа Django.
+    pass
+
+
+def get_environ(scope, body):
+    """WSGI environ по scope HTTP-соединения ASGI."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передает путь байтами, декодированными как latin-1.
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        if name != 'CONTENT_TYPE':
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class AsgiHandler:
+    """ASGI-приложение, выполняющее WSGI-приложение в пуле из threads
+    потоков."""
+
+    def __init__(self, wsgi_application, threads, max_body_size):
+        self.wsgi_application = wsgi_application
+        self.max_body_size = max_body_size
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Соединения {scope["type"]} не поддерживаются')
+        try:
+            body = await self.read_body(receive)
+        except BodyTooLarge:
+            await self.send_response(send, HttpResponse(status=413))
+            return
+        if body is None:
+            return
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            self.executor, self.get_response, get_environ(scope, body)
+        )
+        if response.streaming:
+            await self.send_streaming(send, response)
+        else:
+            await self.send_response(send, response)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Картинки из очереди нарезаются до остановки процесса.
+                await asyncio.get_event_loop().run_in_executor(
+                    self.executor, images.shutdown
+                )
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса целиком или None, если клиент отключился."""
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            body += message.get('body', b'')
+            if len(body) > self.max_body_size:
+                raise BodyTooLarge
+            if not message.get('more_body', False):
+                return bytes(body)
+
+    def get_response(self, environ):
+        """Ответ Django. Соединения с базой освобождаются в потоке вьюхи:
+        обычный ответ закрывается здесь же, и это делает request_finished.
+        Потоковый ответ закрывается позже и, возможно, в другом потоке
+        пула, поэтому для него соединения проверяются сразу после вьюхи, а
+        его части не должны обращаться к базе."""
+        response = self.wsgi_application(environ, start_response)
+        if response.streaming:
+            close_old_connections()
+        else:
+            response.close()
+        return response
+
+    async def send_response(self, send, response):
+        await self.send_start(send, response)
+        await send({'type': 'http.response.body', 'body': response.content})
+
+    async def send_streaming(self, send, response):
+        """Части ответа готовятся в пуле, а отдаются в цикле событий, поэтому
+        между частями медленный клиент не занимает поток."""
+        loop = asyncio.get_event_loop()
+        try:
+            await self.send_start(send, response)
+            chunks = iter(response)
+            while True:
+                chunk = await loop.run_in_executor(
+                    self.executor, next, chunks, _END
+                )
+                if chunk is _END:
+                    break
+                if chunk:
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            # Соединения потока вьюхи уже освобождены в get_response, а
+            # close() закрывает генератор ответа.
+            await loop.run_in_executor(self.executor, response.close)
+
+    @staticmethod
+    async def send_start(send, response):
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in response.items()
+            ] + [
+                (b'set-cookie', cookie.output(header='').strip().encode())
+                for cookie in response.cookies.values()
+            ],
+        })
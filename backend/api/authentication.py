@@ -0,0 +1,97 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_KEY = 'auth_token:{}'
+TOKEN_VERSION_KEY = 'auth_token_version:{}'
+
+
+class TokenCache:
+    """Ограниченный LRU токенов с временем жизни записей.
+
+    Хранится снимок токена вместе с пользователем, каждый запрос получает
+    свою копию. При TOKEN_CACHE_SHARED промахи идут в кэш Django, и
+    токен, загруженный одним процессом, достается остальным без БД.
+
+    Локальная запись действительна, пока не изменилась версия токена в
+    кэше Django: отзыв меняет ее, и запись устаревает во всех процессах.
+    """
+
+    def __init__(self, size, ttl, shared):
+        self.size = size
+        self.ttl = ttl
+        self.shared = shared
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Токен из кэша или None и версия, с которой его сохранять."""
+        version = cache.get(TOKEN_VERSION_KEY.format(key))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                data, expires, entry_version = entry
+                if expires > time.monotonic() and entry_version == version:
+                    self.entries.move_to_end(key)
+                    return pickle.loads(data), version
+                del self.entries[key]
+        if not self.shared:
+            return None, version
+        data = cache.get(TOKEN_KEY.format(key))
+        if data is None:
+            return None, version
+        self.remember(key, data, version)
+        return pickle.loads(data), version
+
+    def set(self, key, token, version):
+        data = pickle.dumps(token)
+        self.remember(key, data, version)
+        if self.shared:
+            cache.set(TOKEN_KEY.format(key), data, self.ttl)
+
+    def remember(self, key, data, version):
+        with self.lock:
+            self.entries[key] = (data, time.monotonic() + self.ttl, version)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.shared:
+            cache.delete(TOKEN_KEY.format(key))
+        # Новая версия живет дольше любой локальной записи со старой.
+        cache.set(TOKEN_VERSION_KEY.format(key), time.time(), self.ttl)
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TTL,
+    settings.TOKEN_CACHE_SHARED
+)
+
+
+def forget_token(key):
+    if key:
+        token_cache.delete(key)
+
+
+class CachingTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который не ходит в БД за известным токеном."""
+
+    def authenticate_credentials(self, key):
+        token, version = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, version)
+            return user, token
+        if not token.user.is_active:
+            forget_token(key)
+            return super().authenticate_credentials(key)
+        return token.user, token
@@ -0,0 +1,360 @@
+import base64
+import json
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from food import recommendations
+from food.counters import recount
+from food.models import (Ingredient, Product, Recipe, ShoppingCart,
+                         Subscription, Tag)
+from food.search import refresh_search
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+user = get_user_model()
+
+BENCH_PASSWORD = 'Bench-pass-2022'
+BENCH_IMAGE = 'recipes/images/bench.png'
+BENCH_METRICS_TOKEN = 'bench-metrics-token'
+# Сценарии, которые выполняются без токена.
+ANONYMOUS_SCENARIOS = ('recipes-list-anonymous', 'recipes-detail-anonymous')
+# Только в этих сценариях включен кэш ответов, остальные меряют полную
+# сборку ответа.
+CACHED_SCENARIOS = ANONYMOUS_SCENARIOS + ('recipes-list-cached', )
+# Абсолютный запас по времени, чтобы не ловить шум на быстрых эндпоинтах.
+TIME_SLACK_MS = 5
+PIXEL_PNG = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/'
+    'PchI7wAAAABJRU5ErkJggg=='
+)
+
+
+def ensure_bench_image():
+    """Восстанавливает картинку рецептов, которую удаляют сценарии
+    изменения и удаления рецепта."""
+    path = os.path.join(settings.MEDIA_ROOT, BENCH_IMAGE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        with open(path, 'wb') as file:
+            file.write(base64.b64decode(PIXEL_PNG))
+
+
+def seed(users=1000, recipes=2000, products=2000, tags=6,
+         ingredients_per_recipe=6, subscriptions_per_user=20,
+         favorites_per_user=15, cart_size=8, random_seed=42):
+    """Заполняет базу синтетическими данными и возвращает главного
+    пользователя бенчмарка."""
+    rnd = random.Random(random_seed)
+    password = make_password(BENCH_PASSWORD)
+    user.objects.bulk_create(
+        user(
+            username=f'bench{num}',
+            email=f'bench{num}@foodgram.ru',
+            first_name=f'Имя{num}',
+            last_name=f'Фамилия{num}',
+            password=password
+        ) for num in range(users)
+    )
+    user_ids = list(user.objects.values_list('id', flat=True))
+    Tag.objects.bulk_create(
+        Tag(name=f'Тэг {num}', color=f'#{num:06x}', slug=f'tag{num}')
+        for num in range(tags)
+    )
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    Product.objects.bulk_create(
+        Product(name=f'продукт {num}', measurement_unit='г')
+        for num in range(products)
+    )
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    Recipe.objects.bulk_create(
+        Recipe(
+            author_id=rnd.choice(user_ids),
+            name=f'Рецепт {num}',
+            image=BENCH_IMAGE,
+            text='Синтетический рецепт для бенчмарка.',
+            cooking_time=rnd.randint(1, 120)
+        ) for num in range(recipes)
+    )
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+
+    tags_through = Recipe.tags.through
+    tags_through.objects.bulk_create(
+        tags_through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rnd.sample(tag_ids, min(2, len(tag_ids)))
+    )
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(
+                recipe_id=recipe_id,
+                product_id=product_id,
+                amount=rnd.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for product_id in rnd.sample(product_ids, ingredients_per_recipe)
+        )
+    )
+    favorites_through = Recipe.favorites.through
+    favorites_through.objects.bulk_create(
+        (
+            favorites_through(recipe_id=recipe_id, customuser_id=user_id)
+            for user_id in user_ids
+            for recipe_id in rnd.sample(recipe_ids, favorites_per_user)
+        )
+    )
+    Subscription.objects.bulk_create(
+        (
+            Subscription(author_id=author_id, subscriber_id=user_id)
+            for user_id in user_ids
+            for author_id in rnd.sample(user_ids, subscriptions_per_user)
+            if author_id != user_id
+        )
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(customer_id=user_id) for user_id in user_ids
+    )
+    carts_through = ShoppingCart.recipes.through
+    carts_through.objects.bulk_create(
+        (
+            carts_through(shoppingcart_id=cart_id, recipe_id=recipe_id)
+            for cart_id in ShoppingCart.objects.values_list('id', flat=True)
+            for recipe_id in rnd.sample(recipe_ids, cart_size)
+        )
+    )
+    recount(Recipe, user, Subscription, ShoppingCart)
+    refresh_search()
+    recommendations.rebuild()
+    main_user = user.objects.get(pk=user_ids[0])
+    Token.objects.create(user=main_user)
+    return main_user
+
+
+def get_scenarios(main_user):
+    """Список (имя, метод, url, данные) для каждого маршрута api/urls.py."""
+    own_recipe = Recipe.objects.filter(author=main_user).first()
+    if own_recipe is None:
+        own_recipe = Recipe.objects.first()
+        own_recipe.author = main_user
+        own_recipe.save()
+    # Состав изменяемого рецепта фиксирован, чтобы число запросов при
+    # обновлении не зависело от размера и случайности набора данных.
+    product_ids = list(Product.objects.values_list('id', flat=True)[:8])
+    own_recipe.tags.set(Tag.objects.all()[2:3])
+    Ingredient.objects.filter(recipe=own_recipe).delete()
+    Ingredient.objects.bulk_create(
+        Ingredient(recipe=own_recipe, product_id=product_id, amount=5)
+        for product_id in product_ids[4:]
+    )
+    product_ids = product_ids[:6]
+    other_recipe = Recipe.objects.exclude(
+        favorites=main_user
+    ).exclude(shopping_carts__customer=main_user).first()
+    fav_recipe = Recipe.objects.filter(favorites=main_user).first()
+    cart_recipe = main_user.shopping_cart.recipes.first()
+    followed = Subscription.objects.filter(subscriber=main_user).first()
+    not_followed = user.objects.exclude(
+        subscriptions__subscriber=main_user
+    ).exclude(pk=main_user.pk).first()
+    tag_slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+    # Страница из середины списка при любом размере набора данных.
+    deep_page = max(Recipe.objects.count() // 15, 1)
+    recipe_payload = {
+        'ingredients': [
+            {'id': product_id, 'amount': 10} for product_id in product_ids
+        ],
+        'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+        'image': f'data:image/png;base64,{PIXEL_PNG}',
+        'name': 'Рецепт бенчмарка',
+        'text': 'Описание',
+        'cooking_time': 15,
+    }
+    bulk_ids = list(Recipe.objects.exclude(
+        favorites=main_user
+    ).exclude(
+        shopping_carts__customer=main_user
+    ).values_list('pk', flat=True)[:7])
+    favorite_ids = list(Recipe.objects.filter(
+        favorites=main_user
+    ).values_list('pk', flat=True)[:7])
+    cart_ids = list(main_user.shopping_cart.recipes.values_list(
+        'pk', flat=True
+    )[:7])
+    tags_query = '&'.join(f'tags={slug}' for slug in tag_slugs)
+    products_query = '&'.join(f'products={pk}' for pk in product_ids)
+    return [
+        ('users-list', 'get', '/api/users/?limit=6', None),
+        ('users-create', 'post', '/api/users/', {
+            'email': 'new-bench@foodgram.ru',
+            'username': 'new-bench',
+            'first_name': 'Новый',
+            'last_name': 'Пользователь',
+            'password': BENCH_PASSWORD,
+        }),
+        ('users-detail', 'get', f'/api/users/{not_followed.pk}/', None),
+        ('users-me', 'get', '/api/users/me/', None),
+        ('users-set-password', 'post', '/api/users/set_password/', {
+            'current_password': BENCH_PASSWORD,
+            'new_password': f'{BENCH_PASSWORD}-new',
+        }),
+        ('users-subscriptions', 'get',
+         '/api/users/subscriptions/?limit=6&recipes_limit=3', None),
+        ('users-subscribe', 'post',
+         f'/api/users/{not_followed.pk}/subscribe/', None),
+        ('users-unsubscribe', 'delete',
+         f'/api/users/{followed.author_id}/subscribe/', None),
+        ('auth-login', 'post', '/api/auth/token/login/', {
+            'email': main_user.email, 'password': BENCH_PASSWORD,
+        }),
+        ('auth-logout', 'post', '/api/auth/token/logout/', None),
+        ('tags-list', 'get', '/api/tags/', None),
+        ('tags-detail', 'get', f'/api/tags/{Tag.objects.first().pk}/', None),
+        ('ingredients-list', 'get', '/api/ingredients/', None),
+        ('ingredients-search', 'get', '/api/ingredients/?name=про', None),
+        ('ingredients-detail', 'get',
+         f'/api/ingredients/{product_ids[0]}/', None),
+        ('recipes-list', 'get', '/api/recipes/?limit=6', None),
+        ('recipes-list-large', 'get', '/api/recipes/?limit=50', None),
+        ('recipes-list-deep', 'get',
+         f'/api/recipes/?limit=6&page={deep_page}', None),
+        ('recipes-list-cursor', 'get', '/api/recipes/?limit=6&cursor=', None),
+        ('recipes-filter-tags', 'get',
+         f'/api/recipes/?limit=6&{tags_query}', None),
+        ('recipes-filter-author', 'get',
+         f'/api/recipes/?limit=6&author={main_user.pk}', None),
+        ('recipes-filter-favorited', 'get',
+         '/api/recipes/?limit=6&is_favorited=1', None),
+        ('recipes-filter-cart', 'get',
+         '/api/recipes/?limit=6&is_in_shopping_cart=1', None),
+        ('recipes-search', 'get',
+         '/api/recipes/?limit=6&search=продукт 1', None),
+        ('recipes-cookable', 'get',
+         f'/api/recipes/cookable/?limit=6&{products_query}', None),
+        ('recipes-detail', 'get', f'/api/recipes/{other_recipe.pk}/', None),
+        ('recipes-list-cached', 'get', '/api/recipes/?limit=6', None),
+        ('recipes-list-anonymous', 'get', '/api/recipes/?limit=6', None),
+        ('recipes-detail-anonymous', 'get',
+         f'/api/recipes/{other_recipe.pk}/', None),
+        ('recipes-similar', 'get',
+         f'/api/recipes/{other_recipe.pk}/similar/?limit=6', None),
+        ('recipes-recommended', 'get',
+         '/api/recipes/recommended/?limit=6', None),
+        ('recipes-create', 'post', '/api/recipes/', recipe_payload),
+        ('recipes-update', 'patch',
+         f'/api/recipes/{own_recipe.pk}/', recipe_payload),
+        ('recipes-delete', 'delete', f'/api/recipes/{own_recipe.pk}/', None),
+        ('favorite-add', 'post',
+         f'/api/recipes/{other_recipe.pk}/favorite/', None),
+        ('favorite-remove', 'delete',
+         f'/api/recipes/{fav_recipe.pk}/favorite/', None),
+        ('cart-add', 'post',
+         f'/api/recipes/{other_recipe.pk}/shopping_cart/', None),
+        ('cart-remove', 'delete',
+         f'/api/recipes/{cart_recipe.pk}/shopping_cart/', None),
+        ('favorite-bulk-add', 'post', '/api/recipes/favorite/',
+         {'recipes': bulk_ids}),
+        ('cart-bulk-add', 'post', '/api/recipes/shopping_cart/',
+         {'recipes': bulk_ids}),
+        ('favorite-bulk-remove', 'delete', '/api/recipes/favorite/',
+         {'recipes': favorite_ids}),
+        ('cart-bulk-remove', 'delete', '/api/recipes/shopping_cart/',
+         {'recipes': cart_ids}),
+        ('cart-download', 'get', '/api/recipes/download_shopping_cart/', None),
+        ('cart-download-csv', 'get',
+         '/api/recipes/download_shopping_cart/?format=csv', None),
+        ('cart-download-json', 'get',
+         '/api/recipes/download_shopping_cart/?format=json', None),
+        ('metrics', 'get', '/api/metrics/', None),
+    ]
+
+
+def measure(main_user, scenarios, repeat=5):
+    """Выполняет сценарии и возвращает метрики по каждому из них.
+
+    Каждый вызов выполняется в транзакции, которая затем откатывается,
+    чтобы изменяющие запросы не влияли на последующие замеры.
+    """
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {main_user.auth_token.key}')
+    scraper = APIClient()
+    scraper.credentials(HTTP_AUTHORIZATION=f'Bearer {BENCH_METRICS_TOKEN}')
+    callers = dict.fromkeys(ANONYMOUS_SCENARIOS, APIClient())
+    callers['metrics'] = scraper
+    results = {}
+    for name, method, url, data in scenarios:
+        caller = callers.get(name, client)
+        cache_timeout = (
+            settings.RESPONSE_CACHE_TIMEOUT if name in CACHED_SCENARIOS else 0
+        )
+        timings = []
+        with override_settings(
+            RESPONSE_CACHE_TIMEOUT=cache_timeout,
+            METRICS_TOKEN=BENCH_METRICS_TOKEN
+        ):
+            for _ in range(repeat):
+                ensure_bench_image()
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = getattr(caller, method)(
+                            url, data=data, format='json'
+                        )
+                        content = b''.join(response)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    transaction.set_rollback(True)
+        results[name] = {
+            'status': response.status_code,
+            'queries': len(queries),
+            'time_ms': round(statistics.median(timings), 2),
+            'bytes': len(content),
+        }
+    return results
+
+
+def compare(results, baseline, time_tolerance=None):
+    """Возвращает список регрессий относительно сохраненной базовой линии.
+
+    Без time_tolerance сравниваются только статусы и число запросов.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if metrics['status'] != expected['status']:
+            regressions.append(
+                f'{name}: статус {metrics["status"]},'
+                f' ожидался {expected["status"]}'
+            )
+        if metrics['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: {metrics["queries"]} запросов к БД,'
+                f' в базовой линии {expected["queries"]}'
+            )
+        if time_tolerance is None:
+            continue
+        time_limit = (expected['time_ms'] * (1 + time_tolerance)
+                      + TIME_SLACK_MS)
+        if metrics['time_ms'] > time_limit:
+            regressions.append(
+                f'{name}: {metrics["time_ms"]} мс,'
+                f' допустимо не более {time_limit:.2f} мс'
+            )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def dump_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write('\n')
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+def release_connections(**kwargs):
+    """Запоминает, когда соединения вернулись в простой."""
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is not None:
+            conn.idle_since = now
+
+
+def check_connections(**kwargs):
+    """Проверяет постоянные соединения, простоявшие дольше порога.
+
+    Django 2.2 закрывает соединение только после ошибки в нем, поэтому
+    оборванное базой или сетью соединение иначе всплыло бы ошибкой
+    в первом же запросе воркера.
+    """
+    threshold = settings.DB_HEALTH_CHECK_IDLE
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is None or conn.in_atomic_block:
+            continue
+        if now - getattr(conn, 'idle_since', now) < threshold:
+            continue
+        if not conn.is_usable():
+            conn.close()
@@ -0,0 +1,203 @@
+import csv
+import io
+import json
+import os
+
+import pydyf
+from django.conf import settings
+from fontTools import subset
+from fontTools.ttLib import TTFont
+
+FOOTER = 'Составлено с ❤ и FoodGram'
+PDF_PAGE_SIZE = (595, 842)
+PDF_MARGIN = 56
+PDF_FONT_SIZE = 12
+PDF_LINE_HEIGHT = 18
+
+
+def export_txt(username, products):
+    yield f'Список покупок для {username}:\n\n'
+    for name, unit, amount in products:
+        yield f'{name} ({unit}) - {amount}\n'
+    yield f'\n{FOOTER}'
+
+
+def export_csv(username, products):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['name', 'measurement_unit', 'amount'])
+    for row in products:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_json(username, products):
+    yield '{"customer": %s, "ingredients": [' % json.dumps(username)
+    for num, (name, unit, amount) in enumerate(products):
+        item = json.dumps(
+            {'name': name, 'measurement_unit': unit, 'amount': amount},
+            ensure_ascii=False
+        )
+        yield item if num == 0 else f', {item}'
+    yield ']}'
+
+
+def export_pdf(username, products):
+    lines = [f'Список покупок для {username}:', '']
+    lines.extend(
+        f'{name} ({unit}) - {amount}' for name, unit, amount in products
+    )
+    lines.extend(['', FOOTER])
+    buffer = io.BytesIO()
+    build_pdf(lines).write(buffer)
+    yield buffer.getvalue()
+
+
+def pdf_available():
+    return os.path.exists(settings.SHOPPING_CART_PDF_FONT)
+
+
+def build_pdf(lines):
+    """Собирает PDF со встроенным подмножеством TrueType-шрифта.
+
+    Стандартные шрифты PDF не содержат кириллицы, поэтому шрифт из
+    SHOPPING_CART_PDF_FONT урезается fonttools до используемых символов
+    и встраивается как CIDFontType2 с кодировкой Identity-H.
+    """
+    font = TTFont(settings.SHOPPING_CART_PDF_FONT)
+    options = subset.Options()
+    options.drop_tables += ['FFTM']
+    subsetter = subset.Subsetter(options=options)
+    subsetter.populate(text=''.join(lines))
+    subsetter.subset(font)
+    font_file = io.BytesIO()
+    font.save(font_file)
+
+    cmap = font.getBestCmap()
+    scale = 1000 / font['head'].unitsPerEm
+    glyph_ids = {}
+    widths = {}
+    for char in set(''.join(lines)):
+        glyph_name = cmap.get(ord(char), '.notdef')
+        glyph_ids[char] = font.getGlyphID(glyph_name)
+        widths[glyph_ids[char]] = round(
+            font['hmtx'][glyph_name][0] * scale
+        )
+
+    document = pydyf.PDF()
+    font_stream = pydyf.Stream(
+        [font_file.getvalue()],
+        {'Length1': len(font_file.getvalue())},
+        compress=True
+    )
+    document.add_object(font_stream)
+    descriptor = pydyf.Dictionary({
+        'Type': '/FontDescriptor',
+        'FontName': '/FoodgramFont',
+        'Flags': 32,
+        'FontBBox': pydyf.Array([
+            round(value * scale) for value in (
+                font['head'].xMin, font['head'].yMin,
+                font['head'].xMax, font['head'].yMax
+            )
+        ]),
+        'ItalicAngle': 0,
+        'Ascent': round(font['hhea'].ascent * scale),
+        'Descent': round(font['hhea'].descent * scale),
+        'CapHeight': round(font['hhea'].ascent * scale),
+        'StemV': 80,
+        'FontFile2': font_stream.reference,
+    })
+    document.add_object(descriptor)
+    width_array = pydyf.Array()
+    for glyph_id in sorted(widths):
+        width_array.extend([glyph_id, pydyf.Array([widths[glyph_id]])])
+    cid_font = pydyf.Dictionary({
+        'Type': '/Font',
+        'Subtype': '/CIDFontType2',
+        'BaseFont': '/FoodgramFont',
+        'CIDSystemInfo': pydyf.Dictionary({
+            'Registry': pydyf.String('Adobe'),
+            'Ordering': pydyf.String('Identity'),
+            'Supplement': 0,
+        }),
+        'FontDescriptor': descriptor.reference,
+        'W': width_array,
+        'CIDToGIDMap': '/Identity',
+    })
+    document.add_object(cid_font)
+    to_unicode = pydyf.Stream([build_to_unicode(glyph_ids)], compress=True)
+    document.add_object(to_unicode)
+    type0_font = pydyf.Dictionary({
+        'Type': '/Font',
+        'Subtype': '/Type0',
+        'BaseFont': '/FoodgramFont',
+        'Encoding': '/Identity-H',
+        'DescendantFonts': pydyf.Array([cid_font.reference]),
+        'ToUnicode': to_unicode.reference,
+    })
+    document.add_object(type0_font)
+
+    width, height = PDF_PAGE_SIZE
+    per_page = (height - 2 * PDF_MARGIN) // PDF_LINE_HEIGHT
+    for start in range(0, len(lines), per_page):
+        content = pydyf.Stream(compress=True)
+        content.begin_text()
+        content.set_font_size('F1', PDF_FONT_SIZE)
+        y = height - PDF_MARGIN
+        for line in lines[start:start + per_page]:
+            content.text_matrix(1, 0, 0, 1, PDF_MARGIN, y)
+            content.show_text(
+                '<' + ''.join(f'{glyph_ids[char]:04x}' for char in line) + '>'
+            )
+            y -= PDF_LINE_HEIGHT
+        content.end_text()
+        document.add_object(content)
+        document.add_page(pydyf.Dictionary({
+            'Type': '/Page',
+            'Parent': document.pages.reference,
+            'MediaBox': pydyf.Array([0, 0, width, height]),
+            'Contents': content.reference,
+            'Resources': pydyf.Dictionary({
+                'Font': pydyf.Dictionary({'F1': type0_font.reference}),
+            }),
+        }))
+    return document
+
+
+def build_to_unicode(glyph_ids):
+    """CMap ToUnicode, чтобы текст из PDF можно было копировать."""
+    chars = sorted(
+        (item for item in glyph_ids.items() if item[1]),
+        key=lambda item: item[1]
+    )
+    blocks = []
+    for start in range(0, len(chars), 100):
+        chunk = chars[start:start + 100]
+        entries = '\n'.join(
+            f'<{glyph_id:04x}> <{char.encode("utf-16-be").hex()}>'
+            for char, glyph_id in chunk
+        )
+        blocks.append(f'{len(chunk)} beginbfchar\n{entries}\nendbfchar\n')
+    return (
+        '/CIDInit /ProcSet findresource begin\n'
+        '12 dict begin\nbegincmap\n'
+        '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+        '/Supplement 0 >> def\n'
+        '/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n'
+        '1 begincodespacerange\n<0000> <ffff>\nendcodespacerange\n'
+        + ''.join(blocks)
+        + 'endcmap\nCMapName currentdict /CMap defineresource pop\n'
+        'end\nend'
+    ).encode()
+
+
+EXPORTERS = {
+    'txt': ('text/plain; charset=utf-8', export_txt),
+    'csv': ('text/csv; charset=utf-8', export_csv),
+    'json': ('application/json; charset=utf-8', export_json),
+    'pdf': ('application/pdf', export_pdf),
+}
@@ -1,5 +1,6 @@
 from django_filters import FilterSet, rest_framework
 from food.models import Product, Recipe, Tag
+from food.search import search_recipes
 
 
 class ProductFilter(FilterSet):
@@ -20,6 +21,7 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = rest_framework.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = rest_framework.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
@@ -36,3 +38,8 @@ class RecipeFilter(FilterSet):
                 shopping_carts=self.request.user.shopping_cart
             )
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value)
+        return queryset
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import time
+
+from api import benchmark
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+DEFAULT_BASELINE = os.path.join(
+    settings.BASE_DIR, 'api', 'benchmark_baseline.json'
+)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными, замеряет '
+            'число запросов, время и размер ответа каждого эндпоинта API '
+            'и сравнивает их с базовой линией.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=3000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--time-tolerance', type=float, default=0.5,
+            help='Допустимый относительный рост времени ответа.'
+        )
+        parser.add_argument(
+            '--queries-only', action='store_true',
+            help='Не сравнивать время ответа: только статусы и число '
+                 'запросов, которые не зависят от машины.'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Сохранить результаты как новую базовую линию.'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    results = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.print_results(results)
+        if options['update_baseline']:
+            benchmark.dump_baseline(options['baseline'], results)
+            self.stdout.write(
+                self.style.SUCCESS(f'Базовая линия: {options["baseline"]}')
+            )
+            return
+        if not os.path.exists(options['baseline']):
+            raise CommandError(
+                f'Базовая линия {options["baseline"]} не найдена, '
+                f'запустите команду с --update-baseline.'
+            )
+        regressions = benchmark.compare(
+            results,
+            benchmark.load_baseline(options['baseline']),
+            None if options['queries_only'] else options['time_tolerance']
+        )
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий не найдено'))
+
+    def run_benchmark(self, options):
+        start = time.perf_counter()
+        main_user = benchmark.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            products=options['products']
+        )
+        self.stdout.write(
+            f'Данные подготовлены за {time.perf_counter() - start:.1f} с'
+        )
+        return benchmark.measure(
+            main_user,
+            benchmark.get_scenarios(main_user),
+            repeat=options['repeat']
+        )
+
+    def print_results(self, results):
+        self.stdout.write(
+            f'{"эндпоинт":<26}{"код":>5}{"запросы":>9}{"мс":>10}{"байт":>10}'
+        )
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<26}{metrics["status"]:>5}{metrics["queries"]:>9}'
+                f'{metrics["time_ms"]:>10.2f}{metrics["bytes"]:>10}'
+            )
@@ -0,0 +1,223 @@
+import asyncio
+import io
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from base64 import b64encode
+
+from api import benchmark
+from api.asgi import AsgiHandler, get_environ, start_response
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from food import images
+from food.models import Product, Tag
+from PIL import Image
+
+
+def noise_image(side):
+    """PNG из шума: почти не сжимается, как фотография блюда."""
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return f'data:image/png;base64,{b64encode(buffer.getvalue()).decode()}'
+
+
+class Network:
+    """Медленный канал клиента: delay секунд на каждые chunk байт и еще
+    delay на запрос и на заголовки ответа."""
+
+    def __init__(self, delay, chunk):
+        self.delay = delay
+        self.chunk = chunk
+
+    def transfer_time(self, size):
+        return self.delay * size / self.chunk
+
+    def request_time(self, size):
+        return self.delay + self.transfer_time(size)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными и сравнивает '
+            'пропускную способность WSGI и ASGI при медленных клиентах на '
+            'выгрузке списка покупок, создании рецепта с картинкой и ленте '
+            'подписок. Число потоков с вьюхами в обоих режимах одинаковое.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=400)
+        parser.add_argument('--products', type=int, default=300)
+        parser.add_argument('--clients', type=int, default=32)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=3)
+        parser.add_argument(
+            '--delay', type=float, default=20,
+            help='Задержка сети клиента в мс на каждые --chunk байт.'
+        )
+        parser.add_argument('--chunk', type=int, default=16 * 1024)
+        parser.add_argument(
+            '--image-side', type=int, default=256,
+            help='Сторона картинки рецепта в пикселях.'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(MEDIA_ROOT=media_root):
+                    results = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(
+            f'{"сценарий":<16}{"режим":>6}{"запр/с":>9}{"p50 мс":>9}'
+            f'{"p95 мс":>9}{"ошибки":>8}'
+        )
+        for name, mode, throughput, timings, errors in results:
+            self.stdout.write(
+                f'{name:<16}{mode:>6}{throughput:>9.1f}'
+                f'{statistics.median(timings):>9.0f}'
+                f'{timings[int(len(timings) * 0.95) - 1]:>9.0f}{errors:>8}'
+            )
+
+    def run_benchmark(self, options):
+        main_user = benchmark.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            products=options['products']
+        )
+        network = Network(options['delay'] / 1000, options['chunk'])
+        application = get_wsgi_application()
+        handler = AsgiHandler(
+            application, options['threads'], settings.ASGI_MAX_BODY_SIZE
+        )
+        headers = [
+            (b'host', b'testserver'),
+            (b'authorization', f'Token {main_user.auth_token.key}'.encode()),
+            (b'content-type', b'application/json'),
+        ]
+        payload = {
+            'ingredients': [
+                {'id': product_id, 'amount': 10}
+                for product_id in Product.objects.values_list(
+                    'id', flat=True
+                )[:6]
+            ],
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'image': noise_image(options['image_side']),
+            'name': 'Рецепт нагрузочного теста',
+            'text': 'Описание',
+            'cooking_time': 15,
+        }
+        scenarios = [
+            ('cart-download', 'GET', '/api/recipes/download_shopping_cart/',
+             b'', b''),
+            ('recipes-create', 'POST', '/api/recipes/', b'',
+             json.dumps(payload).encode()),
+            ('subscriptions', 'GET', '/api/users/subscriptions/',
+             b'limit=6&recipes_limit=3', b''),
+        ]
+        results = []
+        total = options['clients'] * options['requests']
+        for name, method, path, query, body in scenarios:
+            scope = {
+                'type': 'http',
+                'http_version': '1.1',
+                'method': method,
+                'scheme': 'http',
+                'path': path,
+                'query_string': query,
+                'headers': headers,
+                'server': ('testserver', 80),
+                'client': ('127.0.0.1', 0),
+            }
+            modes = (
+                ('wsgi', self.run_wsgi, application),
+                ('asgi', self.run_asgi, handler),
+            )
+            for mode, run, app in modes:
+                start = time.perf_counter()
+                timings, statuses = run(app, scope, body, network, options)
+                elapsed = time.perf_counter() - start
+                results.append((
+                    name, mode, total / elapsed, sorted(timings),
+                    sum(status >= 400 for status in statuses)
+                ))
+        handler.executor.shutdown()
+        # Нарезка картинок должна закончиться до удаления MEDIA_ROOT.
+        images.shutdown()
+        return results
+
+    def run_wsgi(self, application, scope, body, network, options):
+        """Синхронные воркеры: поток занят, пока клиент передает запрос и
+        принимает ответ."""
+        workers = threading.BoundedSemaphore(options['threads'])
+        timings, statuses = [], []
+
+        def request():
+            start = time.perf_counter()
+            with workers:
+                time.sleep(network.request_time(len(body)))
+                response = application(
+                    get_environ(scope, body), start_response
+                )
+                time.sleep(network.delay)
+                for chunk in response:
+                    time.sleep(network.transfer_time(len(chunk)))
+                response.close()
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses.append(response.status_code)
+
+        def client():
+            for _ in range(options['requests']):
+                request()
+
+        clients = [
+            threading.Thread(target=client) for _ in range(options['clients'])
+        ]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        return timings, statuses
+
+    def run_asgi(self, handler, scope, body, network, options):
+        """ASGI: вьюха занимает поток пула только на время обработки."""
+        timings, statuses = [], []
+
+        async def request():
+            start = time.perf_counter()
+
+            async def receive():
+                await asyncio.sleep(network.request_time(len(body)))
+                return {'type': 'http.request', 'body': body}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                    await asyncio.sleep(network.delay)
+                else:
+                    await asyncio.sleep(
+                        network.transfer_time(len(message.get('body', b'')))
+                    )
+
+            await handler(scope, receive, send)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        async def client():
+            for _ in range(options['requests']):
+                await request()
+
+        async def main():
+            await asyncio.gather(
+                *(client() for _ in range(options['clients']))
+            )
+
+        asyncio.run(main())
+        return timings, statuses
@@ -0,0 +1,121 @@
+import os
+import statistics
+import tempfile
+import time
+
+from api import benchmark
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+# Личные страницы не кэшируются, а кэш ответов на время замера выключен,
+# поэтому каждый запрос обращается к базе.
+URLS = (
+    '/api/recipes/?limit=6&is_favorited=1',
+    '/api/users/subscriptions/?limit=6&recipes_limit=3',
+    '/api/recipes/?limit=6',
+)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными, прогоняет '
+            'GET-запросы пользователя через полный цикл WSGI и сравнивает '
+            'накладные расходы на соединение с БД без постоянных '
+            'соединений и с ними.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=400)
+        parser.add_argument('--products', type=int, default=300)
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument(
+            '--max-age', type=int, default=60,
+            help='CONN_MAX_AGE для второго прогона.'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict['TEST']
+        old_test_name = test_settings['NAME']
+        old_max_age = connection.settings_dict['CONN_MAX_AGE']
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # Соединение с базой SQLite в памяти никогда не закрывается.
+                test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                with override_settings(
+                    RESPONSE_CACHE_TIMEOUT=0, MEDIA_ROOT=directory
+                ):
+                    self.run_benchmark(options)
+            finally:
+                connection.settings_dict['CONN_MAX_AGE'] = old_max_age
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = old_test_name
+
+    def run_benchmark(self, options):
+        main_user = benchmark.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            products=options['products']
+        )
+        factory = RequestFactory(
+            HTTP_AUTHORIZATION=f'Token {main_user.auth_token.key}'
+        )
+        handler = WSGIHandler()
+        environs = [factory.get(url).environ for url in URLS]
+        self.stdout.write(
+            f'{"CONN_MAX_AGE":<14}{"соединений":>12}{"мс/запрос":>12}'
+            f'{"p95 мс":>10}'
+        )
+        opened = self.run(handler, environs, 0, options['requests'])
+        if opened < options['requests']:
+            raise CommandError(
+                f'Без постоянных соединений открыто {opened} соединений на '
+                f'{options["requests"]} запросов: часть запросов обошлась '
+                f'без базы, замер не показателен.'
+            )
+        self.run(handler, environs, options['max_age'], options['requests'])
+        self.stdout.write(
+            f'Одно подключение к БД: {self.connect_time():.2f} мс'
+        )
+
+    def run(self, handler, environs, max_age, requests):
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        opened = []
+
+        def count(**kwargs):
+            opened.append(kwargs['connection'].alias)
+
+        connection_created.connect(count)
+        timings = []
+        try:
+            for num in range(requests):
+                environ = dict(environs[num % len(environs)])
+                start = time.perf_counter()
+                response = handler(environ, lambda *args: None)
+                b''.join(response)
+                response.close()
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            connection_created.disconnect(count)
+        timings.sort()
+        self.stdout.write(
+            f'{max_age:<14}{len(opened):>12}'
+            f'{statistics.mean(timings):>12.2f}'
+            f'{timings[int(len(timings) * 0.95)]:>10.2f}'
+        )
+        return len(opened)
+
+    def connect_time(self, attempts=20):
+        timings = []
+        for _ in range(attempts):
+            connection.close()
+            start = time.perf_counter()
+            connection.ensure_connection()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,92 @@
+import statistics
+import time
+
+from api import benchmark, renderers
+from api.middleware import brotli
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+
+def timed(function, repeat):
+    """Результат function и медианное время вызова в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными и для '
+            'GET-сценариев benchmark_api сравнивает время рендеринга JSON '
+            'стандартным json и orjson, а также размер ответа без сжатия, '
+            'с gzip и с Brotli.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            payloads = self.collect(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if not renderers.fast_available():
+            self.stdout.write('orjson не установлен, оба рендерера — json')
+        if brotli is None:
+            self.stdout.write('Brotli не установлен, столбец br пропущен')
+        self.stdout.write(
+            f'{"эндпоинт":<26}{"json мс":>9}{"orjson мс":>11}{"байт":>9}'
+            f'{"gzip":>8}{"gzip мс":>9}{"br":>8}{"br мс":>7}'
+        )
+        for name, data in payloads:
+            self.stdout.write(self.measure(name, data, options['repeat']))
+
+    def collect(self, options):
+        main_user = benchmark.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            products=options['products']
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {main_user.auth_token.key}'
+        )
+        payloads = []
+        for name, method, url, _ in benchmark.get_scenarios(main_user):
+            if method != 'get':
+                continue
+            response = client.get(url)
+            data = getattr(response, 'data', None)
+            if data is not None and not response.streaming:
+                payloads.append((name, data))
+        return payloads
+
+    def measure(self, name, data, repeat):
+        standard = JSONRenderer()
+        fast = renderers.FastJSONRenderer()
+        content, standard_ms = timed(lambda: standard.render(data), repeat)
+        _, fast_ms = timed(lambda: fast.render(data), repeat)
+        gzipped, gzip_ms = timed(lambda: compress_string(content), repeat)
+        line = (
+            f'{name:<26}{standard_ms:>9.2f}{fast_ms:>11.2f}{len(content):>9}'
+            f'{len(gzipped):>8}{gzip_ms:>9.2f}'
+        )
+        if brotli is not None:
+            compressed, brotli_ms = timed(
+                lambda: brotli.compress(
+                    content, quality=settings.BROTLI_QUALITY
+                ),
+                repeat
+            )
+            line += f'{len(compressed):>8}{brotli_ms:>7.2f}'
+        return line
@@ -0,0 +1,170 @@
+import json
+
+from api import benchmark, representations, serializers
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from food.models import Product, Recipe, Tag, annotate_subscription
+from food.search import match_products
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+user = get_user_model()
+
+RECIPES_LIMIT = 3
+
+
+def dump(data):
+    # Без sort_keys, чтобы расхождение в порядке полей тоже было видно.
+    return json.dumps(data, ensure_ascii=False)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными и сверяет '
+            'ответы representations с сериализаторами, включая порядок '
+            'полей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--products', type=int, default=200)
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            mismatches = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if mismatches:
+            raise CommandError(
+                f'Расхождения: {", ".join(mismatches)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Ответы совпадают'))
+
+    def run(self, options):
+        main_user = benchmark.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            products=options['products']
+        )
+        # Половина рецептов с готовыми копиями обложки.
+        Recipe.objects.filter(id__in=Recipe.objects.values_list(
+            'id', flat=True
+        )[::2]).update(image_variants_ready=True)
+        request = Request(APIRequestFactory().get(
+            '/', {'recipes_limit': RECIPES_LIMIT}
+        ))
+        request.user = main_user
+        context = {'request': request}
+        renderer = representations.RecipeRenderer(request)
+        recipes = Recipe.objects.order_by('-published')
+        flagged = recipes.with_user_flags(main_user)
+        rows = flagged.values(
+            *representations.RECIPE_VALUES
+        )
+        matches = {
+            row['recipe_id']: row for row in match_products(
+                Product.objects.values_list('id', flat=True)[:20]
+            )
+        }
+        cookable = list(flagged.filter(pk__in=matches))
+        cookable_rows = list(rows.filter(pk__in=matches))
+        for recipe in cookable:
+            recipe.coverage = round(matches[recipe.id]['coverage'], 3)
+            recipe.missing_count = matches[recipe.id]['missing']
+        for row in cookable_rows:
+            row['coverage'] = round(matches[row['id']]['coverage'], 3)
+            row['missing_count'] = matches[row['id']]['missing']
+        authors = user.objects.filter(
+            subscriptions__subscriber=main_user
+        ).order_by('id')
+        author_rows = annotate_subscription(authors, main_user).values(
+            *representations.USER_VALUES, 'recipes_count'
+        )
+        users = user.objects.order_by('id')
+
+        checks = {
+            'recipes': (
+                serializers.RecipeSerializer(
+                    flagged, many=True, context=context
+                ).data,
+                renderer.render(rows),
+            ),
+            'recipe-detail': (
+                serializers.RecipeSerializer(
+                    flagged, many=True, context=context,
+                    image_variant='detail'
+                ).data,
+                representations.RecipeRenderer(request, 'detail').render(
+                    rows
+                ),
+            ),
+            'recipes-cookable': (
+                serializers.CookableRecipeSerializer(
+                    cookable, many=True, context=context
+                ).data,
+                renderer.render(cookable_rows, ('coverage', 'missing_count')),
+            ),
+            'recipes-short': (
+                serializers.RecipeSerializer(
+                    recipes, many=True, context=context,
+                    fields=['id', 'name', 'image', 'cooking_time']
+                ).data,
+                [renderer.render_short(recipe) for recipe in recipes],
+            ),
+            'users': (
+                serializers.UserSerializer(
+                    users, many=True, context=context
+                ).data,
+                representations.render_users(users, request),
+            ),
+            'subscriptions': (
+                serializers.UserSupscriptionsSerializer(
+                    authors, many=True, context=context
+                ).data,
+                representations.render_subscriptions(
+                    author_rows,
+                    Recipe.objects.latest_by_author(
+                        [author.id for author in authors], RECIPES_LIMIT
+                    ),
+                    representations.RecipeRenderer(request, 'thumbnail')
+                ),
+            ),
+            'tags': (
+                serializers.TagSerializer(Tag.objects.all(), many=True).data,
+                [representations.render_tag(row) for row in Tag.objects.values(
+                    *representations.render_tag.names
+                )],
+            ),
+            'products': (
+                serializers.ProductSerializer(
+                    Product.objects.all(), many=True
+                ).data,
+                [
+                    representations.render_product(row)
+                    for row in Product.objects.values(
+                        *representations.render_product.names
+                    )
+                ],
+            ),
+        }
+        mismatches = []
+        for name, (expected, actual) in checks.items():
+            if dump(expected) == dump(actual):
+                self.stdout.write(f'{name}: {len(actual)} совпадают')
+                continue
+            mismatches.append(name)
+            for position, (left, right) in enumerate(zip(expected, actual)):
+                if dump(left) != dump(right):
+                    self.stdout.write(
+                        f'{name}[{position}]:\n'
+                        f'  сериализатор:    {dump(left)}\n'
+                        f'  representations: {dump(right)}'
+                    )
+                    break
+            else:
+                self.stdout.write(
+                    f'{name}: {len(expected)} и {len(actual)} объектов'
+                )
+        return mismatches
@@ -0,0 +1,148 @@
+import json
+import re
+from collections import defaultdict
+
+from api import benchmark
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+# Таблицы из десятков строк читаются целиком дешевле, чем по индексу.
+SMALL_TABLE_ROWS = 100
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+COUNT_WRAPPER = re.compile(
+    r'^SELECT COUNT\(\*\) FROM \((.*)\) subquery$', re.S
+)
+PARENTHESES = re.compile(r'\([^()]*\)')
+
+
+def is_filtered(sql):
+    """Есть ли у внешнего запроса условие WHERE.
+
+    Полный список и COUNT(*) всей ленты читают таблицу целиком при любых
+    индексах, такие запросы не проверяются.
+    """
+    match = COUNT_WRAPPER.match(sql)
+    while match:
+        sql = match.group(1)
+        match = COUNT_WRAPPER.match(sql)
+    stripped = None
+    while stripped != sql:
+        stripped, sql = sql, PARENTHESES.sub('', sql)
+    return ' WHERE ' in sql
+
+
+def postgres_seq_scans(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    tables = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            tables.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', ()))
+    return tables
+
+
+def sqlite_seq_scans(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        rows = cursor.fetchall()
+    return [
+        match.group(1) for match in (
+            SQLITE_SCAN.match(row[-1]) for row in rows
+        ) if match
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными, выполняет '
+            'GET-сценарии benchmark_api и показывает запросы, для которых '
+            'план выполнения читает таблицу целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=3000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если найдено полное чтение '
+                 'таблицы.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'postgresql':
+            explain = postgres_seq_scans
+        elif connection.vendor == 'sqlite':
+            explain = sqlite_seq_scans
+        else:
+            raise CommandError(f'{connection.vendor} не поддерживается')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            found = self.run(explain, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for table, scenarios in sorted(found.items()):
+            self.stdout.write(f'{table}: {", ".join(sorted(scenarios))}')
+        if not found:
+            self.stdout.write(self.style.SUCCESS('Полных чтений таблиц нет'))
+        elif options['strict']:
+            raise CommandError(
+                f'Полное чтение таблиц: {", ".join(sorted(found))}'
+            )
+
+    def run(self, explain, options):
+        main_user = benchmark.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            products=options['products']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            if connection.vendor == 'postgresql':
+                # Seq Scan останется в плане, только если индекса нет.
+                cursor.execute('SET enable_seqscan = off')
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {main_user.auth_token.key}'
+        )
+        tables = self.large_tables()
+        found = defaultdict(set)
+        for name, method, url, _ in benchmark.get_scenarios(main_user):
+            if method != 'get':
+                continue
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    b''.join(client.get(url))
+                for sql in self.filtered_selects(queries):
+                    scanned = set(explain(sql)) & tables
+                    for table in scanned:
+                        found[table].add(name)
+                    if scanned and options['verbosity'] > 1:
+                        self.stdout.write(f'{name}: {sql}\n')
+                transaction.set_rollback(True)
+        return found
+
+    def large_tables(self):
+        tables = set()
+        with connection.cursor() as cursor:
+            for table in connection.introspection.table_names(cursor):
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                if cursor.fetchone()[0] >= SMALL_TABLE_ROWS:
+                    tables.add(table)
+        return tables
+
+    def filtered_selects(self, queries):
+        for query in queries.captured_queries:
+            sql = query['sql'].strip()
+            if sql.upper().startswith('SELECT') and is_filtered(sql):
+                yield sql
@@ -0,0 +1,176 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BYTES_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Статистика одного запроса, собираемая обертками вокруг SQL."""
+
+    def __init__(self, slow_queries):
+        self.view = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.slow_queries = slow_queries
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.sql_time += duration
+            entry = (duration, self.queries, sql)
+            if len(self.slowest) < self.slow_queries:
+                heapq.heappush(self.slowest, entry)
+            elif self.slowest and duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+
+def start_request(slow_queries):
+    _local.stats = RequestStats(slow_queries)
+    return _local.stats
+
+
+def finish_request():
+    _local.stats = None
+
+
+def current_request():
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def timed_serialization():
+    """Учитывает время сборки ответа во вьюхе текущего запроса.
+
+    Считается только внешний блок, вложенные уже входят в его время.
+    Работает и как декоратор.
+    """
+    stats = current_request()
+    if stats is None or stats.serializer_depth:
+        yield
+        return
+    stats.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - start
+        stats.serializer_depth -= 1
+
+
+class TimedSerializerMixin:
+    """Учитывает время сериализации во вьюхе текущего запроса."""
+
+    def to_representation(self, instance):
+        with timed_serialization():
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.values = defaultdict(lambda: [[0] * (len(buckets) + 1), 0, 0])
+
+    def observe(self, view, value):
+        counts, _, _ = entry = self.values[view]
+        counts[bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for view, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket
+                lines.append(
+                    f'{self.name}_bucket{{view="{view}",le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{self.name}_sum{{view="{view}"}} {total}')
+            lines.append(f'{self.name}_count{{view="{view}"}} {count}')
+        return lines
+
+
+class Registry:
+    """Гистограммы по вьюхам, общие для всех потоков процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = Histogram(
+            'foodgram_request_duration_seconds',
+            'Время обработки запроса.', DURATION_BUCKETS
+        )
+        self.sql = Histogram(
+            'foodgram_sql_duration_seconds',
+            'Суммарное время SQL-запросов за запрос.', DURATION_BUCKETS
+        )
+        self.serializer = Histogram(
+            'foodgram_serializer_duration_seconds',
+            'Время сериализации ответа.', DURATION_BUCKETS
+        )
+        self.queries = Histogram(
+            'foodgram_request_queries',
+            'Число SQL-запросов за запрос.', QUERY_BUCKETS
+        )
+        self.response_bytes = Histogram(
+            'foodgram_response_bytes',
+            'Размер тела ответа.', BYTES_BUCKETS
+        )
+        self.cache_results = defaultdict(int)
+
+    def observe(self, stats, duration, size):
+        view = stats.view or 'unresolved'
+        with self.lock:
+            self.duration.observe(view, duration)
+            self.sql.observe(view, stats.sql_time)
+            self.serializer.observe(view, stats.serializer_time)
+            self.queries.observe(view, stats.queries)
+            if size is not None:
+                self.response_bytes.observe(view, size)
+
+    def count_cache(self, view, hit):
+        with self.lock:
+            self.cache_results[view, 'hit' if hit else 'miss'] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for histogram in (self.duration, self.sql, self.serializer,
+                              self.queries, self.response_bytes):
+                lines.extend(histogram.render())
+            lines.extend([
+                '# HELP foodgram_response_cache_total '
+                'Обращения к общему кэшу ответов.',
+                '# TYPE foodgram_response_cache_total counter',
+            ])
+            for (view, result), count in sorted(self.cache_results.items()):
+                lines.append(
+                    f'foodgram_response_cache_total{{view="{view}",'
+                    f'result="{result}"}} {count}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
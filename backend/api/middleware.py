@@ -0,0 +1,138 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from . import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript')
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме запрещенных через q=0."""
+    encodings = set()
+    for item in header.split(','):
+        name, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            encodings.add(name.lower())
+    return encodings
+
+
+def view_label(request, view_func):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return view_func.__name__
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if action is None:
+        return view_class.__name__
+    return f'{view_class.__name__}.{action}'
+
+
+class InstrumentationMiddleware:
+    """Считает запросы к БД, время SQL, сериализации и размер ответа.
+
+    Результат отдается заголовком Server-Timing, копится в гистограммах
+    для /api/metrics/, а самые медленные запросы пишутся в лог.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.start_request(settings.METRICS_SLOW_QUERIES)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request()
+        duration = time.perf_counter() - start
+
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = ', '.join([
+            f'db;desc="{stats.queries} queries";'
+            f'dur={stats.sql_time * 1000:.1f}',
+            f'serializer;dur={stats.serializer_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+        metrics.registry.observe(stats, duration, size)
+        self.log_slow_queries(stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = metrics.current_request()
+        if stats is not None:
+            stats.view = view_label(request, view_func)
+
+    def log_slow_queries(self, stats):
+        threshold = settings.METRICS_SLOW_QUERY_MS / 1000
+        for duration, _, sql in sorted(stats.slowest, reverse=True):
+            if duration < threshold:
+                break
+            logger.warning(
+                'Медленный запрос %.1f мс во вьюхе %s: %s',
+                duration * 1000, stats.view, sql
+            )
+
+
+class CompressionMiddleware:
+    """Сжимает крупные ответы Brotli или gzip по заголовку Accept-Encoding.
+
+    Ответы меньше COMPRESSION_MIN_SIZE байт отдаются как есть: выигрыш в
+    размере не окупает время сжатия. Brotli выбирается, если модуль
+    установлен и клиент его принимает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '')
+        if (response.streaming or response.has_header('Content-Encoding')
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        encodings = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if brotli is not None and 'br' in encodings:
+            encoding = 'br'
+            content = brotli.compress(
+                response.content, quality=settings.BROTLI_QUALITY
+            )
+        elif 'gzip' in encodings:
+            encoding = 'gzip'
+            content = compress_string(response.content)
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # Сжатое тело отличается побайтно, поэтому ETag становится слабым.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        return response
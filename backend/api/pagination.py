@@ -1,5 +1,93 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class DefaultPagination(PageNumberPagination):
+    """Постраничная пагинация с опциональным режимом курсора.
+
+    Если у вьюхи задан cursor_ordering, а в запросе есть параметр cursor
+    (для первой страницы — пустой), страница выбирается по ключу
+    последней записи вместо OFFSET и без подсчета общего количества.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'cursor_ordering', None)
+        if not self.ordering or self.cursor_query_param not in (
+            request.query_params
+        ):
+            self.ordering = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(queryset.model, cursor)
+            )
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_keyset_filter(self, model, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            names = [field.lstrip('-') for field in self.ordering]
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, values)
+            ]
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(values) != len(names):
+            raise NotFound(self.invalid_cursor_message)
+        keyset_filter = Q()
+        for num, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{names[num]}__{lookup}': values[num]})
+            for prev in range(num):
+                condition &= Q(**{names[prev]: values[prev]})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = last[name] if isinstance(last, dict) else getattr(
+                last, name
+            )
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        cursor = base64.urlsafe_b64encode(json.dumps(values).encode())
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor.decode()
+        )
+
+    def get_paginated_response(self, data):
+        if self.ordering is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_cursor_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,183 @@
+"""Быстрая отрисовка ответов для чтения.
+
+Строки .values() превращаются в словари по планам полей, собранным один
+раз при импорте, без создания сериализаторов и моделей на каждый объект.
+Формат ответа совпадает с сериализаторами из serializers.py, что
+проверяет команда check_representations.
+"""
+from collections import defaultdict
+from operator import attrgetter, itemgetter
+
+from django.contrib.auth import get_user_model
+from food import images
+from food.models import Ingredient, Recipe, annotate_subscription
+
+from .metrics import timed_serialization
+
+user = get_user_model()
+
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email')
+USER_VALUES = (*USER_FIELDS, 'is_subscribed')
+# published нужен курсору пагинации, в ответ он не попадает.
+RECIPE_VALUES = (
+    'id', 'author_id', 'published', 'name', 'image', 'image_variants_ready',
+    'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart'
+)
+
+
+class Plan:
+    """Порядок полей ответа и их источники в строке.
+
+    Поле задается именем или парой (имя в ответе, имя в строке).
+    """
+
+    def __init__(self, *fields, getter=itemgetter):
+        self.names = tuple(
+            field if isinstance(field, str) else field[0] for field in fields
+        )
+        self.get = getter(*(
+            field if isinstance(field, str) else field[1] for field in fields
+        ))
+
+    def __call__(self, row):
+        return dict(zip(self.names, self.get(row)))
+
+
+render_user = Plan(*USER_VALUES)
+render_tag = Plan('id', 'name', 'color', 'slug')
+render_product = Plan('id', 'name', 'measurement_unit')
+_recipe_tag = Plan(
+    ('id', 'tag__id'), ('name', 'tag__name'), ('color', 'tag__color'),
+    ('slug', 'tag__slug')
+)
+_ingredient = Plan(
+    ('id', 'product_id'), ('name', 'product__name'),
+    ('measurement_unit', 'product__measurement_unit'), 'amount'
+)
+_recipe_text = Plan('name', 'text', 'cooking_time')
+_short_recipe_text = Plan('name', 'cooking_time', getter=attrgetter)
+
+
+class RecipeRenderer:
+    """Рецепты в формате RecipeSerializer с картинкой нужного размера."""
+
+    def __init__(self, request, image_variant='card'):
+        self.request = request
+        self.image_variant = image_variant
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def url(self, name):
+        url = self.storage.url(name)
+        if self.request is None:
+            return url
+        return self.request.build_absolute_uri(url)
+
+    def image(self, name, ready):
+        if not name:
+            return None
+        if ready:
+            name = images.variant_name(name, self.image_variant, 'jpeg')
+        return self.url(name)
+
+    def images(self, name, ready):
+        if not ready:
+            return None
+        return {
+            variant: {
+                extension: self.url(
+                    images.variant_name(name, variant, extension)
+                )
+                for extension in images.FORMATS
+            }
+            for variant in images.VARIANTS
+        }
+
+    @timed_serialization()
+    def render(self, rows, extra=()):
+        """Рецепты из строк с RECIPE_VALUES и полями extra.
+
+        Теги, ингредиенты и авторы подгружаются тремя запросами на всю
+        пачку.
+        """
+        rows = list(rows)
+        ids = [row['id'] for row in rows]
+        tags = defaultdict(list)
+        for row in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by('tag__name').values(
+            'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'
+        ):
+            tags[row['recipe_id']].append(_recipe_tag(row))
+        ingredients = defaultdict(list)
+        for row in Ingredient.objects.filter(
+            recipe_id__in=ids
+        ).order_by('id').values(
+            'recipe_id', 'product_id', 'product__name',
+            'product__measurement_unit', 'amount'
+        ):
+            ingredients[row['recipe_id']].append(_ingredient(row))
+        authors = {
+            author['id']: author for author in render_users(
+                user.objects.filter(
+                    pk__in={row['author_id'] for row in rows}
+                ),
+                self.request
+            )
+        }
+        result = []
+        for row in rows:
+            recipe = {
+                'id': row['id'],
+                'tags': tags[row['id']],
+                'author': authors[row['author_id']],
+                'ingredients': ingredients[row['id']],
+                'is_favorited': row['is_favorited'],
+                'is_in_shopping_cart': row['is_in_shopping_cart'],
+                'image': self.image(row['image'], row['image_variants_ready']),
+                'images': self.images(
+                    row['image'], row['image_variants_ready']
+                ),
+            }
+            # Объявленные в сериализаторе поля идут раньше полей модели.
+            for field in extra:
+                recipe[field] = row[field]
+            recipe.update(_recipe_text(row))
+            result.append(recipe)
+        return result
+
+    @timed_serialization()
+    def render_short(self, recipe):
+        """Краткий рецепт из объекта модели, как RecipeSerializer с
+        fields=['id', 'name', 'image', 'cooking_time']."""
+        return {
+            'id': recipe.id,
+            'image': self.image(recipe.image.name,
+                                recipe.image_variants_ready),
+            **_short_recipe_text(recipe),
+        }
+
+
+@timed_serialization()
+def render_users(queryset, request):
+    """Пользователи в формате UserSerializer с флагом подписки."""
+    return [
+        render_user(row) for row in annotate_subscription(
+            queryset, request.user
+        ).values(*USER_VALUES)
+    ]
+
+
+@timed_serialization()
+def render_subscriptions(rows, author_recipes, renderer):
+    """Авторы в формате UserSupscriptionsSerializer."""
+    return [
+        {
+            **render_user(row),
+            'recipes': [
+                renderer.render_short(recipe)
+                for recipe in author_recipes[row['id']]
+            ],
+            'recipes_count': row['recipes_count'],
+        }
+        for row in rows
+    ]
@@ -1,19 +1,21 @@
-import os
-
 from django.conf import settings
 from django.contrib.auth import get_user_model, password_validation
 from django.core import exceptions
+from django.db import transaction
 from django.forms import ValidationError
 from drf_extra_fields.fields import Base64ImageField
+from food import images
+from food.cache import bump_cart_versions
 from food.models import Ingredient, Product, Recipe, Subscription, Tag
 from rest_framework import serializers
 
 from . import utils
+from .metrics import TimedSerializerMixin
 
 user = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор пользователей."""
     is_subscribed = serializers.SerializerMethodField('check_subscription')
     password = serializers.CharField(
@@ -22,6 +24,8 @@ class UserSerializer(serializers.ModelSerializer):
     )
 
     def check_subscription(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context['request']
         if request.user.is_authenticated:
             return Subscription.objects.filter(author=obj).filter(
@@ -44,9 +48,7 @@ class UserSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        cur_user = user.objects.create_user(**validated_data)
-        cur_user.save()
-        return cur_user
+        return user.objects.create_user(**validated_data)
 
     class Meta:
         model = user
@@ -61,7 +63,7 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор типов продуктов."""
     amount = serializers.IntegerField(
         source='ingridient.amount',
@@ -73,14 +75,14 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор тэгов."""
     class Meta:
         model = Tag
         fields = '__all__'
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор ингредиентов."""
     id = serializers.ReadOnlyField(source='product.id')
     name = serializers.ReadOnlyField(source='product.name')
@@ -93,7 +95,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         exclude = ['product', 'recipe']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор рецептов."""
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
@@ -108,9 +110,11 @@ class RecipeSerializer(serializers.ModelSerializer):
         '_get_shopping_cart', read_only=True
     )
     image = Base64ImageField()
+    images = serializers.SerializerMethodField('_get_images')
 
     def __init__(self, *args, **kwargs):
         fields = kwargs.pop('fields', None)
+        self.image_variant = kwargs.pop('image_variant', None)
 
         super().__init__(*args, **kwargs)
 
@@ -120,32 +124,42 @@ class RecipeSerializer(serializers.ModelSerializer):
             for field_name in existing - allowed:
                 self.fields.pop(field_name)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         obj = super().create(validated_data)
         obj.tags.set(tags)
         utils.create_ingredients(obj, ingredients)
+        images.schedule_variants(obj)
         return obj
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' in validated_data:
             new_ingredients = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        utils.create_ingredients(instance, new_ingredients)
-        if 'image' in validated_data:
-            old_image_path = instance.image
-            os.remove(os.path.join(settings.MEDIA_ROOT, str(old_image_path)))
-        return super().update(instance, validated_data)
+            if utils.sync_ingredients(instance, new_ingredients):
+                bump_cart_versions(recipes=instance)
+        new_image = 'image' in validated_data
+        if new_image:
+            images.schedule_cleanup(instance.image.name)
+            validated_data['image_variants_ready'] = False
+        instance = super().update(instance, validated_data)
+        if new_image:
+            images.schedule_variants(instance)
+        return instance
 
     def validate_ingredients(self, data):
-        ids = []
+        ids = set()
+        existing = set(Product.objects.filter(
+            pk__in=[ingredient['id'] for ingredient in data]
+        ).values_list('pk', flat=True))
         for ingredient in data:
             msg = {}
             if ingredient['id'] in ids:
                 msg['id'] = (f'Ингредиент с id {ingredient["id"]}'
                              f' добавлен более 1 раза.')
-            if not Product.objects.filter(pk=ingredient['id']).exists():
+            if int(ingredient['id']) not in existing:
                 msg['id'] = (f'Продукт с id {ingredient["id"]}'
                              f' отсутствует в базе.')
             if (not isinstance(int(ingredient['amount']), int)
@@ -153,20 +167,24 @@ class RecipeSerializer(serializers.ModelSerializer):
                 msg['amount'] = 'Количество должно быть числом больше 0.'
             if msg:
                 raise ValidationError(msg)
-            ids.append(ingredient['id'])
+            ids.add(ingredient['id'])
         return data
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         if 'ingredients' in self.fields:
             representation['ingredients'] = IngredientSerializer(
-                Ingredient.objects.filter(recipe=instance), many=True
+                self._get_ingredients(instance), many=True
             ).data
         if 'tags' in self.fields:
             representation['tags'] = TagSerializer(
                 instance.tags.all(),
                 many=True
             ).data
+        if 'image' in self.fields and instance.image_variants_ready:
+            representation['image'] = self._variant_url(
+                instance, self._get_image_variant(), 'jpeg'
+            )
         return representation
 
     def validate_image(self, data):
@@ -174,20 +192,80 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise ValidationError('Это поле не может быть пустым.')
         return data
 
+    def _get_image_variant(self):
+        if self.image_variant is not None:
+            return self.image_variant
+        view = self.context.get('view')
+        if getattr(view, 'action', None) == 'retrieve':
+            return 'detail'
+        return 'card'
+
+    def _variant_url(self, obj, variant, extension):
+        url = obj.image.storage.url(
+            images.variant_name(obj.image.name, variant, extension)
+        )
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def _get_images(self, obj):
+        if not obj.image_variants_ready:
+            return None
+        return {
+            variant: {
+                extension: self._variant_url(obj, variant, extension)
+                for extension in images.FORMATS
+            }
+            for variant in images.VARIANTS
+        }
+
+    def _get_ingredients(self, obj):
+        if 'ingredient_set' in getattr(obj, '_prefetched_objects_cache', {}):
+            return obj.ingredient_set.all()
+        return obj.ingredient_set.select_related('product')
+
     def _get_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return obj.shopping_carts.filter(customer_id=request.user.id).exists()
 
     def _get_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return obj.favorites.filter(pk=request.user.id).exists()
 
     class Meta:
         model = Recipe
-        exclude = ['favorites', 'published']
+        exclude = [
+            'favorites', 'published', 'favorites_count', 'in_carts_count',
+            'image_variants_ready'
+        ]
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетного добавления и удаления."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT,
+        error_messages={
+            'max_length': 'Не больше {max_length} рецептов за один запрос.'
+        }
+    )
+
+
+class CookableRecipeSerializer(RecipeSerializer):
+    """Рецепт с долей имеющихся продуктов и числом недостающих."""
+    coverage = serializers.FloatField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        pass
 
 
-class UserSupscriptionsSerializer(serializers.ModelSerializer):
+class UserSupscriptionsSerializer(TimedSerializerMixin,
+                                  serializers.ModelSerializer):
     """Сериализатор подписок."""
     recipes = serializers.SerializerMethodField('get_limited_recipes')
     recipes_count = serializers.SerializerMethodField('count_recipes')
@@ -207,22 +285,22 @@ class UserSupscriptionsSerializer(serializers.ModelSerializer):
         ]
 
     def get_limited_recipes(self, obj):
-        limit = self.context['request'].query_params.get('recipes_limit', None)
-        if limit is not None:
-            queryset = obj.recipes.all().order_by('-published')[:int(limit)]
-        else:
-            queryset = obj.recipes.all().order_by('-published')
+        limit = utils.get_recipes_limit(self.context['request'])
+        queryset = obj.recipes.all().order_by('-published')[:limit]
         return RecipeSerializer(
             queryset,
             many=True,
             fields=['id', 'name', 'image', 'cooking_time'],
+            image_variant='thumbnail',
             context={'request': self.context['request']}
         ).data
 
     def count_recipes(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def check_subscription(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context['request']
         return Subscription.objects.filter(author=obj).filter(
             subscriber=request.user
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token
+
+user = get_user_model()
+
+
+def forget_token_on_commit(key):
+    # До фиксации параллельный запрос загрузил бы из БД еще старый токен.
+    transaction.on_commit(lambda: forget_token(key))
+
+
+# Удаление пользователя удаляет и его токен, поэтому отдельный обработчик
+# для него не нужен.
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token_on_commit(instance.key)
+
+
+@receiver(post_save, sender=user)
+def token_user_changed(sender, instance, created, update_fields, **kwargs):
+    # В кэше токена лежит снимок пользователя, в том числе is_active.
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        'key', flat=True
+    ):
+        forget_token_on_commit(key)
@@ -24,6 +24,16 @@ urlpatterns = [
         ),
         name='recipe_add_2_cart'
     ),
+    path(
+        'recipes/favorite/',
+        views.BulkFavoriteView.as_view(),
+        name='recipes_bulk_fav'
+    ),
+    path(
+        'recipes/shopping_cart/',
+        views.BulkShoppingCartView.as_view(),
+        name='recipes_bulk_cart'
+    ),
     path(
         'recipes/download_shopping_cart/',
         views.ExportShoppingCart.as_view({'get': 'get'}),
@@ -55,5 +65,6 @@ urlpatterns = [
         views.UserSetPasswordViewset.as_view(),
         name='set_password'
     ),
+    path('metrics/', views.metrics_view, name='metrics'),
     path('', include(router.urls)),
 ]
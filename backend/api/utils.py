@@ -11,6 +11,13 @@ def check_fields(request, fields):
     return None
 
 
+def get_recipes_limit(request):
+    """recipes_limit из запроса; без него или с нечисловым значением
+    рецепты не ограничиваются."""
+    limit = request.query_params.get('recipes_limit', '')
+    return int(limit) if limit.isdigit() else None
+
+
 def create_ingredients(obj, ingredients):
     objects = []
     for ingredient in ingredients:
@@ -20,3 +27,39 @@ def create_ingredients(obj, ingredients):
             recipe_id=obj.id
         ))
     Ingredient.objects.bulk_create(objects)
+
+
+def sync_ingredients(obj, ingredients):
+    """Приводит ингредиенты рецепта к переданному списку.
+
+    Сравнивает текущие строки с новыми и выполняет только нужные вставки,
+    обновления и удаления пакетами. Возвращает True, если состав изменился.
+    """
+    existing = {
+        row.product_id: row for row in Ingredient.objects.filter(recipe=obj)
+    }
+    amounts = {
+        int(ingredient['id']): int(ingredient['amount'])
+        for ingredient in ingredients
+    }
+    to_delete = [
+        row.pk for product_id, row in existing.items()
+        if product_id not in amounts
+    ]
+    to_create = [
+        Ingredient(product_id=product_id, amount=amount, recipe_id=obj.id)
+        for product_id, amount in amounts.items()
+        if product_id not in existing
+    ]
+    to_update = []
+    for product_id, row in existing.items():
+        if product_id in amounts and row.amount != amounts[product_id]:
+            row.amount = amounts[product_id]
+            to_update.append(row)
+    if to_delete:
+        Ingredient.objects.filter(pk__in=to_delete).delete()
+    if to_create:
+        Ingredient.objects.bulk_create(to_create)
+    if to_update:
+        Ingredient.objects.bulk_update(to_update, ['amount'])
+    return bool(to_delete or to_create or to_update)
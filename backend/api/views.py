@@ -1,20 +1,38 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import BooleanField, F, Value
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import (http_date, parse_etags, parse_http_date_safe,
+                               urlencode)
 from django_filters import rest_framework as dfilters
-from food.models import Product, Recipe, ShoppingCart, Subscription, Tag
+from food.cache import (FEED_TAG, USER_IDS, author_tag, bump_cart_versions,
+                        forget_user_ids, get_cart_products, get_catalogue,
+                        get_tag_versions, get_tagged, get_user_ids, recipe_tag,
+                        set_tagged)
+from food.counters import recount_links
+from food.models import (Product, Recipe, RecipeSimilarity, Recommendation,
+                         ShoppingCart, Subscription, Tag,
+                         annotate_subscription)
+from food.search import AUTOCOMPLETE_LIMIT, get_product_index, match_products
 from rest_framework import mixins, permissions, status, views, viewsets
 from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from . import exporters
 from . import filters as local_filters
-from . import pagination
+from . import metrics, negotiation, pagination
 from . import permissions as local_rights
-from . import serializers, utils
+from . import representations, serializers, utils
 
 user = get_user_model()
 
+RANKED_ACTIONS = ('cookable', 'similar', 'recommended')
+
 
 class TokenLogin(viewsets.ViewSet):
     permission_classes = [permissions.AllowAny, ]
@@ -65,21 +83,73 @@ class UserViewset(
         local_rights.AllowPostOrReadOnly | local_rights.IsAdmin
     ]
     pagination_class = pagination.DefaultPagination
+    cursor_ordering = ('id', )
     queryset = user.objects.all().order_by('id')
     serializer_class = serializers.UserSerializer
 
-    def get_object(self):
-        if 'me' in self.request.get_full_path():
-            return self.request.user
-        return get_object_or_404(user, pk=self.kwargs['pk'])
+    def get_rows(self):
+        return annotate_subscription(
+            self.get_queryset(), self.request.user
+        ).values(*representations.USER_VALUES)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_rows())
+        with metrics.timed_serialization():
+            data = [representations.render_user(row) for row in page]
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        if 'me' in request.get_full_path():
+            pk = request.user.pk
+        else:
+            pk = kwargs['pk']
+        row = get_object_or_404(self.get_rows(), pk=pk)
+        with metrics.timed_serialization():
+            return Response(representations.render_user(row))
+
+
+class CatalogueMixin():
+    """Отдает список справочника из кэша с поддержкой условных GET."""
+    catalogue_name = None
+    catalogue_plan = None
+
+    def list(self, request, *args, **kwargs):
+        data, etag, modified = get_catalogue(
+            self.catalogue_name,
+            lambda: [
+                self.catalogue_plan(row) for row in self.get_queryset().values(
+                    *self.catalogue_plan.names
+                )
+            ]
+        )
+        headers = {'ETag': etag, 'Last-Modified': http_date(modified)}
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            # Сравнение слабое: сжатые ответы отдаются с W/ перед ETag.
+            not_modified = etag in {
+                tag[2:] if tag.startswith('W/') else tag
+                for tag in parse_etags(if_none_match)
+            }
+        else:
+            since = parse_http_date_safe(
+                request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+            )
+            not_modified = since is not None and int(modified) <= since
+        if not_modified:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        return Response(data, headers=headers)
 
 
 class TagViewset(
+    CatalogueMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
 ):
     """Вьюха тэгов"""
+    catalogue_name = 'tags'
+    catalogue_plan = representations.render_tag
     permission_classes = [local_rights.ReadOnly | local_rights.IsAdmin]
     pagination_class = None
     queryset = Tag.objects.all()
@@ -87,11 +157,14 @@ class TagViewset(
 
 
 class ProductViewset(
+    CatalogueMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
 ):
     """Вьюха продуктов"""
+    catalogue_name = 'products'
+    catalogue_plan = representations.render_product
     pagination_class = None
     permission_classes = [local_rights.ReadOnly | local_rights.IsAdmin]
     queryset = Product.objects.all().order_by('id')
@@ -99,9 +172,126 @@ class ProductViewset(
     filter_backends = (dfilters.DjangoFilterBackend, )
     filterset_class = local_filters.ProductFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit', '')
+        return Response(get_product_index().search(
+            name,
+            int(limit) if limit.isdigit() else AUTOCOMPLETE_LIMIT
+        ))
+
+
+class SharedCacheMixin():
+    """Собирает ответы list и retrieve из общего кэша страниц.
+
+    Тело страницы не зависит от пользователя: флаги избранного, корзины и
+    подписки на автора каждый раз накладываются заново по множествам id
+    из get_user_ids, у анонима они пустые. Записи помечены тегами ленты,
+    рецепта и справочников и устаревают при изменении данных. Параметры
+    из personal_params отбирают рецепты пользователя, такие страницы не
+    кэшируются.
+    """
+    personal_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            (FEED_TAG, 'tags', 'products'),
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            (recipe_tag(kwargs['pk']), 'tags', 'products'),
+            super().retrieve, request, *args,
+            author_tags=lambda data: [author_tag(data['author']['id'])],
+            **kwargs
+        )
+
+    def cached_response(self, tags, handler, request, *args,
+                        author_tags=None, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if not timeout or any(
+            name in request.query_params for name in self.personal_params
+        ):
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        view = f'{type(self).__name__}.{self.action}'
+        data = get_tagged(key)
+        metrics.registry.count_cache(view, data is not None)
+        if data is not None:
+            self.personalize(data)
+            return Response(data)
+        versions = get_tag_versions(tags)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            if author_tags is not None:
+                # Автор известен только после выборки. Его версия снимается
+                # позже, и правка профиля в этот момент проживет в кэше до
+                # истечения записи.
+                versions.update(get_tag_versions(author_tags(response.data)))
+            set_tagged(key, response.data, versions, timeout)
+        return response
+
+    def personalize(self, data):
+        if self.request.user.is_authenticated:
+            ids = get_user_ids(self.request.user.pk)
+        else:
+            ids = dict.fromkeys(USER_IDS, frozenset())
+        for recipe in data.get('results', [data]):
+            recipe['is_favorited'] = recipe['id'] in ids['favorites']
+            recipe['is_in_shopping_cart'] = (
+                recipe['id'] in ids['shopping_cart']
+            )
+            recipe['author']['is_subscribed'] = (
+                recipe['author']['id'] in ids['subscriptions']
+            )
+
+    def get_response_cache_key(self, request):
+        # Ссылки на картинки и страницы абсолютные, поэтому адрес входит
+        # в ключ целиком вместе со схемой и хостом. Пустые значения не
+        # влияют на фильтры, кроме пустого cursor: он включает режим курсора.
+        cursor = getattr(self.paginator, 'cursor_query_param', None)
+        params = sorted(
+            (name, sorted(
+                value for value in values if value or name == cursor
+            ))
+            for name, values in request.query_params.lists()
+        )
+        query = urlencode(
+            [(name, values) for name, values in params if values],
+            doseq=True
+        )
+        digest = hashlib.md5(
+            f'{request.build_absolute_uri(request.path)}?{query}'.encode()
+        ).hexdigest()
+        return f'response:{self.action}:{digest}'
+
+
+class RecipeReadMixin():
+    """Отдает рецепты на чтение через representations без сериализаторов."""
+
+    def get_renderer(self, image_variant='card'):
+        return representations.RecipeRenderer(self.request, image_variant)
+
+    def get_rows(self):
+        return self.queryset.with_user_flags(self.request.user).values(
+            *representations.RECIPE_VALUES
+        )
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_rows()))
+        return self.get_paginated_response(self.get_renderer().render(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        row = get_object_or_404(self.get_rows(), pk=kwargs['pk'])
+        return Response(self.get_renderer('detail').render([row])[0])
 
-class RecipeViewset(viewsets.ModelViewSet):
+
+class RecipeViewset(SharedCacheMixin, RecipeReadMixin, viewsets.ModelViewSet):
     """Вьюха рецептов"""
+    personal_params = ('is_favorited', 'is_in_shopping_cart')
     serializer_class = serializers.RecipeSerializer
     pagination_class = pagination.DefaultPagination
     permission_classes = [
@@ -111,9 +301,94 @@ class RecipeViewset(viewsets.ModelViewSet):
     filter_class = local_filters.RecipeFilter
     queryset = Recipe.objects.all().order_by('-published')
 
+    @property
+    def cursor_ordering(self):
+        # Результаты поиска и подбора по продуктам сортируются по
+        # релевантности, курсор по дате к ним не применим.
+        if self.action in RANKED_ACTIONS or self.request.query_params.get(
+            'search'
+        ):
+            return None
+        return ('-published', '-id')
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False)
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из продуктов ?products=."""
+        try:
+            product_ids = {
+                int(pk) for pk in request.query_params.getlist('products')
+            }
+            max_missing = request.query_params.get('max_missing')
+            if max_missing is not None:
+                max_missing = int(max_missing)
+        except ValueError:
+            return Response(
+                {'detail': 'products и max_missing должны быть числами.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not product_ids:
+            return Response(
+                {'products': 'Укажите хотя бы один продукт.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self.get_ranked_response(
+            match_products(product_ids, max_missing),
+            extra=('coverage', 'missing_count'),
+            decorate=self._decorate_match
+        )
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        """Похожие рецепты из предпосчитанной таблицы соседей."""
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        return self.get_ranked_response(
+            RecipeSimilarity.objects.filter(recipe=recipe).order_by(
+                '-score', 'similar_id'
+            ).values('similar_id'),
+            key='similar_id'
+        )
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    def recommended(self, request):
+        """Персональные рекомендации, а без них — самые популярные."""
+        rows = Recommendation.objects.filter(user=request.user).order_by(
+            '-score', 'recipe_id'
+        ).values('recipe_id')
+        if not rows.exists():
+            rows = Recipe.objects.order_by('-favorites_count', '-id').values(
+                recipe_id=F('id')
+            )
+        return self.get_ranked_response(rows)
+
+    def get_ranked_response(self, rows, key='recipe_id', extra=(),
+                            decorate=None):
+        """Страница рецептов в порядке строк rows, содержащих id в key."""
+        page = self.paginate_queryset(rows)
+        recipes = {
+            recipe['id']: recipe for recipe in self.get_rows().filter(
+                pk__in=[row[key] for row in page]
+            )
+        }
+        result = []
+        for row in page:
+            recipe = recipes.get(row[key])
+            if recipe is None:
+                continue
+            if decorate is not None:
+                decorate(recipe, row)
+            result.append(recipe)
+        return self.get_paginated_response(
+            self.get_renderer().render(result, extra)
+        )
+
+    @staticmethod
+    def _decorate_match(recipe, row):
+        recipe['coverage'] = round(row['coverage'], 3)
+        recipe['missing_count'] = row['missing']
+
 
 class UserSetPasswordViewset(views.APIView):
     permission_classes = [permissions.IsAuthenticated | local_rights.IsAdmin]
@@ -143,13 +418,31 @@ class UserSetPasswordViewset(views.APIView):
 class SubscribeListView(mixins.ListModelMixin, viewsets.GenericViewSet):
     permission_classes = [permissions.IsAuthenticated | local_rights.IsAdmin]
     pagination_class = pagination.DefaultPagination
+    cursor_ordering = ('id', )
     serializer_class = serializers.UserSupscriptionsSerializer
 
     def get_queryset(self):
         return user.objects.filter(
             subscriptions__subscriber=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
         ).order_by('id')
 
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset().values(
+            *representations.USER_VALUES, 'recipes_count'
+        ))
+        author_recipes = Recipe.objects.latest_by_author(
+            [author['id'] for author in page],
+            utils.get_recipes_limit(request)
+        )
+        return self.get_paginated_response(
+            representations.render_subscriptions(
+                page, author_recipes,
+                representations.RecipeRenderer(request, 'thumbnail')
+            )
+        )
+
 
 class PostDeleteMixin():
     def post(self, request, recipe_id):
@@ -177,12 +470,10 @@ class PostDeleteMixin():
         if self.view_name == 'shopping_carts':
             cur_value.recipes.add(recipe_obj)
 
-        recipe_data = serializers.RecipeSerializer(
-            recipe_obj,
-            context={'request': request},
-            fields=['id', 'name', 'image', 'cooking_time']
-        ).data
-        return Response(recipe_data, status=status.HTTP_201_CREATED)
+        return Response(
+            representations.RecipeRenderer(request).render_short(recipe_obj),
+            status=status.HTTP_201_CREATED
+        )
 
     def delete(self, request, recipe_id):
         cur_user = request.user
@@ -218,6 +509,109 @@ class AddToShoppingCartView(viewsets.ViewSet, PostDeleteMixin):
     view_name = 'shopping_carts'
 
 
+class BulkPostDeleteMixin():
+    """Добавляет и удаляет сразу несколько рецептов.
+
+    Принимает {"recipes": [id, ...]}, работает в одной транзакции
+    несколькими запросами на весь список и возвращает статус по каждому id.
+    """
+    through = None
+    owner_field = None
+    counter_name = None
+    user_ids_name = None
+
+    def get_owner_id(self, create):
+        return self.request.user.pk
+
+    def owner_changed(self, owner_id):
+        pass
+
+    def get_recipe_ids(self, request):
+        serializer = serializers.RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['recipes']))
+
+    def get_linked(self, owner_id, recipe_ids):
+        return set(self.through.objects.filter(
+            **{self.owner_field: owner_id}, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+
+    def post(self, request):
+        recipe_ids = self.get_recipe_ids(request)
+        with transaction.atomic():
+            owner_id = self.get_owner_id(create=True)
+            found = set(Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', flat=True))
+            linked = self.get_linked(owner_id, found)
+            added = found - linked
+            self.through.objects.bulk_create([
+                self.through(**{self.owner_field: owner_id}, recipe_id=pk)
+                for pk in added
+            ], ignore_conflicts=True)
+            # bulk_create не отправляет m2m_changed, счетчики и множества
+            # id обновляются здесь.
+            recount_links(Recipe, added, self.counter_name, self.through)
+            if added:
+                self.owner_changed(owner_id)
+                forget_user_ids(request.user.pk, self.user_ids_name)
+        return Response({'results': [
+            {'id': pk, 'status': 'added' if pk in added else
+             'exists' if pk in linked else 'not_found'}
+            for pk in recipe_ids
+        ]})
+
+    def delete(self, request):
+        recipe_ids = self.get_recipe_ids(request)
+        with transaction.atomic():
+            owner_id = self.get_owner_id(create=False)
+            removed = set()
+            if owner_id is not None:
+                removed = self.get_linked(owner_id, recipe_ids)
+                self.through.objects.filter(
+                    **{self.owner_field: owner_id}, recipe_id__in=removed
+                ).delete()
+                recount_links(
+                    Recipe, removed, self.counter_name, self.through
+                )
+            if removed:
+                self.owner_changed(owner_id)
+                forget_user_ids(request.user.pk, self.user_ids_name)
+        return Response({'results': [
+            {'id': pk, 'status': 'removed' if pk in removed else 'absent'}
+            for pk in recipe_ids
+        ]})
+
+
+class BulkFavoriteView(BulkPostDeleteMixin, views.APIView):
+    permission_classes = [permissions.IsAuthenticated | local_rights.IsAdmin]
+    through = Recipe.favorites.through
+    owner_field = 'customuser_id'
+    counter_name = 'favorites_count'
+    user_ids_name = 'favorites'
+
+
+class BulkShoppingCartView(BulkPostDeleteMixin, views.APIView):
+    permission_classes = [permissions.IsAuthenticated | local_rights.IsAdmin]
+    through = ShoppingCart.recipes.through
+    owner_field = 'shoppingcart_id'
+    counter_name = 'in_carts_count'
+    user_ids_name = 'shopping_cart'
+
+    def get_owner_id(self, create):
+        if create:
+            cart, _ = ShoppingCart.objects.get_or_create(
+                customer=self.request.user
+            )
+            return cart.pk
+        return ShoppingCart.objects.filter(
+            customer=self.request.user
+        ).values_list('pk', flat=True).first()
+
+    def owner_changed(self, owner_id):
+        bump_cart_versions(pk=owner_id)
+
+
 class SubscribeView(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated | local_rights.IsAdmin]
 
@@ -231,7 +625,11 @@ class SubscribeView(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         else:
-            Subscription.objects.create(author=author, subscriber=request.user)
+            # Вместе с подпиской в post_save растет счетчик подписчиков.
+            with transaction.atomic():
+                Subscription.objects.create(
+                    author=author, subscriber=request.user
+                )
             user_data = serializers.UserSupscriptionsSerializer(
                 author,
                 context={'request': request}
@@ -259,27 +657,44 @@ class SubscribeView(viewsets.ViewSet):
 
 class ExportShoppingCart(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated | local_rights.IsAdmin]
+    content_negotiation_class = negotiation.IgnoreFormatNegotiation
 
     def get(self, request):
-        data = request.user.shopping_cart.recipes.all().values(
-            'ingredients__name',
-            'ingredients__measurement_unit'
-        ).annotate(amount=Sum('ingredient__amount'))
-        text = []
-        text.append(f'Список покупок для {request.user.username}:\n')
-        for product in data:
-            text.append(f"{product['ingredients__name']}"
-                        f" ({product['ingredients__measurement_unit']})"
-                        f" - {product['amount']}")
-        text.append('\nСоставлено с ❤ и FoodGram')
-        ready_text = '\n'.join(text)
-        response = HttpResponse(
-            ready_text,
-            content_type="text/plain,charset=utf8"
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in exporters.EXPORTERS or (
+            export_format == 'pdf' and not exporters.pdf_available()
+        ):
+            return Response(
+                {'errors': f'Формат {export_format} не поддерживается'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        cart = get_object_or_404(ShoppingCart, customer=request.user)
+        content_type, exporter = exporters.EXPORTERS[export_format]
+        response = StreamingHttpResponse(
+            exporter(request.user.username, get_cart_products(cart)),
+            content_type=content_type
         )
         response['Content-Disposition'] = (
             'attachment; filename={0}'.format(
-                f'{request.user.username}_shopping_cart.txt'
+                f'{request.user.username}_shopping_cart.{export_format}'
             )
         )
         return response
+
+
+def metrics_view(request):
+    """Гистограммы запросов этого процесса в текстовом формате Prometheus.
+
+    Доступны по METRICS_TOKEN в заголовке Authorization: Bearer или
+    сотрудникам, вошедшим в админку. Без токена — только сотрудникам.
+    """
+    token = settings.METRICS_TOKEN
+    scraper = token and (
+        request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}'
+    )
+    if not scraper and not request.user.is_staff:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
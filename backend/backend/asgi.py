@@ -0,0 +1,21 @@
+"""
+ASGI config for backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+# Приложения Django загружаются до импорта моделей обработчиком.
+wsgi_application = get_wsgi_application()
+
+from api.asgi import AsgiHandler  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+application = AsgiHandler(
+    wsgi_application, settings.ASGI_THREADS, settings.ASGI_MAX_BODY_SIZE
+)
@@ -26,6 +26,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,9 +66,30 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
         'HOST': os.getenv('DB_HOST', '127.0.0.1'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Постоянное соединение, простоявшее дольше стольких секунд, проверяется
+# перед запросом.
+DB_HEALTH_CHECK_IDLE = float(os.getenv('DB_HEALTH_CHECK_IDLE', 10))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+# Кэш в памяти процесса: запись и сброс в одном воркере gunicorn не видны
+# остальным, поэтому без общего кэша по умолчанию работает один процесс.
+CACHE_PER_PROCESS = CACHES['default']['BACKEND'] == (
+    'django.core.cache.backends.locmem.LocMemCache'
+)
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', 1 if CACHE_PER_PROCESS else 3))
+
 AUTH_USER_MODEL = 'users.CustomUser'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -94,10 +117,33 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachingTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
+# Ответы меньше этого размера в байтах не сжимаются.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+# Качество Brotli от 0 до 11; старшие уровни слишком медленны для ответов
+# API, сжимаемых на лету.
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+BULK_RECIPES_LIMIT = 100
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', '') == 'True'
+
+# Время жизни кэшированных страниц ленты рецептов, 0 отключает кэш. Сбросы
+# по тегам в кэше процесса не доходят до других воркеров, и те отдавали бы
+# измененные и удаленные рецепты, поэтому там кэш страниц выключен.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+if CACHE_PER_PROCESS and WEB_WORKERS > 1:
+    RESPONSE_CACHE_TIMEOUT = 0
+
 LANGUAGE_CODE = 'ru-ru'
 
 TIME_ZONE = 'UTC'
@@ -115,3 +161,19 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles/')
 MEDIA_URL = '/mediafiles/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles/')
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+# Потоки, в которых ASGI-приложение выполняет синхронные вьюхи, и предел
+# тела запроса, которое оно принимает в память.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 4))
+ASGI_MAX_BODY_SIZE = int(os.getenv('ASGI_MAX_BODY_SIZE', 10 * 1024 * 1024))
+
+METRICS_SLOW_QUERIES = int(os.getenv('METRICS_SLOW_QUERIES', 5))
+METRICS_SLOW_QUERY_MS = float(os.getenv('METRICS_SLOW_QUERY_MS', 100))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
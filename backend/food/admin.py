@@ -1,5 +1,4 @@
 from django.contrib.admin import ModelAdmin, register
-from django.db.models import Count
 
 from .models import (Ingredient, Product, Recipe, ShoppingCart, Subscription,
                      Tag)
@@ -49,12 +48,15 @@ class RecipeAdmin(ModelAdmin):
     show_tags.short_description = 'Тэги'
 
     def fav_count(self, obj):
-        return obj.fav_count
+        return obj.favorites_count
     fav_count.short_description = 'Счетчик избранного'
+    fav_count.admin_order_field = 'favorites_count'
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.annotate(fav_count=Count('favorites'))
+        return queryset.select_related('author').prefetch_related(
+            'tags', 'ingredients'
+        )
 
 
 @register(Subscription)
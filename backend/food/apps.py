@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FoodConfig(AppConfig):
     name = 'food'
     verbose_name = "Еда"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils.http import quote_etag
+
+from .models import Ingredient, Recipe, ShoppingCart, Subscription
+
+CART_KEY = 'shopping_cart:{}:{}'
+CART_TIMEOUT = 60 * 60 * 24
+CATALOGUE_KEY = 'catalogue:{}:{}'
+CATALOGUE_MODIFIED_KEY = 'catalogue:{}:modified'
+CATALOGUE_TIMEOUT = 60 * 60
+RESPONSE_TAG_KEY = 'response_tag:{}'
+FEED_TAG = 'feed'
+USER_IDS_KEY = 'user_ids:{}:{}'
+USER_IDS_TIMEOUT = 60 * 5
+
+
+def get_cart_products(cart):
+    """Возвращает суммарный список продуктов корзины.
+
+    Ключ кэша содержит версию корзины, поэтому любое изменение ее состава
+    делает старую запись недостижимой во всех процессах сразу.
+    """
+    key = CART_KEY.format(cart.pk, cart.version)
+    products = cache.get(key)
+    if products is None:
+        products = [
+            (row['product__name'], row['product__measurement_unit'],
+             row['amount'])
+            for row in Ingredient.objects.filter(
+                recipe__shopping_carts=cart
+            ).values(
+                'product__name', 'product__measurement_unit'
+            ).annotate(amount=Sum('amount')).order_by('product__name')
+        ]
+        cache.set(key, products, CART_TIMEOUT)
+    return products
+
+
+def bump_cart_versions(**filters):
+    ShoppingCart.objects.filter(**filters).update(version=F('version') + 1)
+
+
+def get_catalogue(name, build):
+    """Возвращает (данные, ETag, время изменения) справочника name.
+
+    Ключ кэша содержит время последнего изменения справочника, которое
+    сдвигают сигналы моделей. ETag считается по содержимому, поэтому
+    совпадает во всех процессах.
+    """
+    modified = cache.get_or_set(
+        CATALOGUE_MODIFIED_KEY.format(name), time.time, None
+    )
+    key = CATALOGUE_KEY.format(name, modified)
+    entry = cache.get(key)
+    if entry is None:
+        data = build()
+        digest = hashlib.md5(
+            json.dumps(data, ensure_ascii=False, sort_keys=True).encode()
+        ).hexdigest()
+        entry = (data, quote_etag(digest), modified)
+        cache.set(key, entry, CATALOGUE_TIMEOUT)
+    return entry
+
+
+def bump_catalogue(name):
+    """Сдвигает время изменения справочника после фиксации транзакции, как
+    и bump_response_tags."""
+    transaction.on_commit(lambda: cache.set(
+        CATALOGUE_MODIFIED_KEY.format(name), time.time(), None
+    ))
+
+
+def recipe_tag(pk):
+    return f'recipe:{pk}'
+
+
+def author_tag(pk):
+    return f'author:{pk}'
+
+
+def get_tag_versions(tags):
+    """Возвращает текущие версии тегов, заводя недостающие."""
+    keys = {RESPONSE_TAG_KEY.format(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {tag: versions[key] for key, tag in keys.items()}
+
+
+def bump_response_tags(*tags):
+    """Делает недействительными ответы, собранные с любым из тегов.
+
+    Версии меняются после фиксации транзакции, иначе конкурентный запрос
+    успел бы закэшировать старые данные уже с новыми версиями.
+    """
+    transaction.on_commit(lambda: cache.set_many(
+        {RESPONSE_TAG_KEY.format(tag): uuid.uuid4().hex for tag in tags},
+        None
+    ))
+
+
+def get_tagged(key):
+    """Значение из кэша, если версии его тегов с тех пор не менялись."""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    versions, value = entry
+    if get_tag_versions(versions) != versions:
+        return None
+    return value
+
+
+def set_tagged(key, value, versions, timeout):
+    """Сохраняет значение вместе с версиями тегов, снятыми до его сборки."""
+    cache.set(key, (versions, value), timeout)
+
+
+def _favorite_ids(user_id):
+    return Recipe.favorites.through.objects.filter(
+        customuser_id=user_id
+    ).values_list('recipe_id', flat=True)
+
+
+def _cart_ids(user_id):
+    return ShoppingCart.recipes.through.objects.filter(
+        shoppingcart__customer_id=user_id
+    ).values_list('recipe_id', flat=True)
+
+
+def _followed_ids(user_id):
+    return Subscription.objects.filter(
+        subscriber_id=user_id
+    ).values_list('author_id', flat=True)
+
+
+USER_IDS = {
+    'favorites': _favorite_ids,
+    'shopping_cart': _cart_ids,
+    'subscriptions': _followed_ids,
+}
+
+
+def get_user_ids(user_id):
+    """Возвращает {имя: множество id} избранного, корзины и подписок.
+
+    Множества живут в кэше, пока их не сбросит forget_user_ids, но не
+    дольше USER_IDS_TIMEOUT. Они используются только вместе с кэшем
+    страниц, который без общего бэкенда кэша при нескольких воркерах
+    выключен.
+    """
+    keys = {USER_IDS_KEY.format(user_id, name): name for name in USER_IDS}
+    found = cache.get_many(keys)
+    missing = {
+        key: set(USER_IDS[name](user_id))
+        for key, name in keys.items() if key not in found
+    }
+    if missing:
+        cache.set_many(missing, USER_IDS_TIMEOUT)
+        found.update(missing)
+    return {name: found[key] for key, name in keys.items()}
+
+
+def forget_user_ids(user_id, name):
+    transaction.on_commit(
+        lambda: cache.delete(USER_IDS_KEY.format(user_id, name))
+    )
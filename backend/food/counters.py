@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def count_related(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешний объект."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('*')
+            ).values('total')
+        ),
+        Value(0)
+    )
+
+
+def recount(recipe_model, user_model, subscription_model, cart_model):
+    """Пересчитывает все счетчики двумя запросами UPDATE."""
+    recipe_model.objects.update(
+        favorites_count=count_related(
+            recipe_model.favorites.through, 'recipe_id'
+        ),
+        in_carts_count=count_related(cart_model.recipes.through, 'recipe_id')
+    )
+    user_model.objects.update(
+        recipes_count=count_related(recipe_model, 'author_id'),
+        subscribers_count=count_related(subscription_model, 'author_id')
+    )
+
+
+def recount_links(recipe_model, pks, field, through):
+    """Пересчитывает счетчик field рецептов pks по строкам связи through.
+
+    Счетчик берется из числа строк, а не сдвигается, поэтому не
+    расходится, когда параллельные запросы добавляют один и тот же рецепт
+    и ignore_conflicts вставляет только одну строку.
+    """
+    if pks:
+        recipe_model.objects.filter(pk__in=pks).update(
+            **{field: count_related(through, 'recipe_id')}
+        )
+
+
+def shift_counter(model, pks, field, delta):
+    """Сдвигает счетчик field у объектов pks на delta.
+
+    Счетчик не опускается ниже нуля: после правок в обход API он может
+    разойтись с данными, а PositiveIntegerField не пропустит минус.
+    """
+    if pks and delta:
+        model.objects.filter(pk__in=pks).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
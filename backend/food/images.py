@@ -0,0 +1,127 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .cache import FEED_TAG, bump_response_tags, recipe_tag
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 1200,
+}
+FORMATS = {
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+def variant_name(image_name, variant, extension):
+    """Путь варианта картинки рядом с оригиналом, в подпапке variants."""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, 'variants', f'{stem}_{variant}.{extension}'
+    )
+
+
+def variant_names(image_name):
+    return [
+        variant_name(image_name, variant, extension)
+        for variant in VARIANTS
+        for extension in FORMATS
+    ]
+
+
+def variant_original_stem(filename):
+    """Имя оригинала (без расширения), от которого нарезан вариант."""
+    return os.path.splitext(filename)[0].rsplit('_', 1)[0]
+
+
+def schedule_variants(recipe):
+    """Ставит нарезку вариантов в очередь после фиксации транзакции."""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: _executor.submit(run_in_worker, recipe_id, image_name)
+    )
+
+
+def shutdown():
+    """Дожидается нарезки из очереди. Новые задачи после этого не
+    принимаются."""
+    _executor.shutdown(wait=True)
+
+
+def run_in_worker(recipe_id, image_name):
+    try:
+        build_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception('Не удалось подготовить картинки рецепта %s',
+                         recipe_id)
+    finally:
+        close_old_connections()
+
+
+def build_variants(recipe_id, image_name):
+    with default_storage.open(image_name) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original = original.convert('RGB')
+    for variant, size in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, **options)
+            name = variant_name(image_name, variant, extension)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    if Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_variants_ready=True
+    ):
+        bump_response_tags(FEED_TAG, recipe_tag(recipe_id))
+
+
+def schedule_cleanup(image_name):
+    """Удаляет файлы старой обложки в фоне после фиксации транзакции."""
+    if image_name:
+        transaction.on_commit(
+            lambda: _executor.submit(cleanup_in_worker, image_name)
+        )
+
+
+def cleanup_in_worker(image_name):
+    try:
+        delete_image_files(image_name)
+    except Exception:
+        logger.exception('Не удалось удалить файлы обложки %s', image_name)
+    finally:
+        close_old_connections()
+
+
+def delete_image_files(image_name):
+    """Удаляет оригинал и варианты, если на них не ссылается ни один рецепт.
+
+    Возвращает число освобожденных байт.
+    """
+    if Recipe.objects.filter(image=image_name).exists():
+        return 0
+    freed = 0
+    for name in (image_name, *variant_names(image_name)):
+        if default_storage.exists(name):
+            freed += default_storage.size(name)
+            default_storage.delete(name)
+    return freed
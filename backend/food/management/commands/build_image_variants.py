@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand
+from food.images import build_variants
+from food.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Готовит уменьшенные копии обложек рецептов, '
+            'для которых их еще нет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии для всех рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants_ready=False)
+        done = failed = 0
+        for pk, image in recipes.values_list('pk', 'image').iterator():
+            try:
+                build_variants(pk, image)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {pk}: {error}')
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {done}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management import BaseCommand
+from food import recommendations
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает похожие рецепты и персональные рекомендации '
+            'по избранному и корзинам пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=20,
+            help='Сколько похожих рецептов хранить для каждого рецепта.'
+        )
+        parser.add_argument(
+            '--top-n', type=int, default=50,
+            help='Сколько рекомендаций хранить для каждого пользователя.'
+        )
+        parser.add_argument(
+            '--max-user-items', type=int, default=500,
+            help='Не учитывать в сходстве пользователей с большим числом '
+                 'рецептов в избранном и корзине.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        users, recipes, recommended = recommendations.rebuild(
+            options['top_k'], options['top_n'], options['max_user_items']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {users}, рецептов с соседями: {recipes}, '
+            f'пользователей с рекомендациями: {recommended}. '
+            f'Время: {time.perf_counter() - start:.2f} с'
+        ))
@@ -0,0 +1,76 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.utils import timezone
+from food.images import variant_original_stem
+from food.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Удаляет обложки рецептов и их уменьшенные копии, '
+            'на которые не ссылается ни один рецепт.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд '
+                 '(рецепт с ними может еще сохраняться).'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать файлы, ничего не удаляя.'
+        )
+
+    def handle(self, *args, **options):
+        directory = Recipe._meta.get_field('image').upload_to
+        referenced = set(Recipe.objects.values_list('image', flat=True))
+        stems = {
+            os.path.splitext(os.path.basename(name))[0] for name in referenced
+        }
+        deadline = timezone.now() - timedelta(seconds=options['min_age'])
+
+        orphans = [
+            name for name in self.list_files(directory)
+            if name not in referenced
+        ]
+        orphans += [
+            name for name in self.list_files(os.path.join(directory,
+                                                          'variants'))
+            if variant_original_stem(os.path.basename(name)) not in stems
+        ]
+        orphans = [
+            name for name in orphans
+            if default_storage.get_modified_time(name) < deadline
+        ]
+
+        batch_size = options['batch_size']
+        deleted = freed = 0
+        for offset in range(0, len(orphans), batch_size):
+            batch = orphans[offset:offset + batch_size]
+            restored = set(Recipe.objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            for name in batch:
+                if name in restored:
+                    continue
+                freed += default_storage.size(name)
+                deleted += 1
+                if not options['dry_run']:
+                    default_storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {deleted}, освобождено '
+            f'{freed / 1024 / 1024:.2f} МБ'
+            f'{" (пробный запуск)" if options["dry_run"] else ""}'
+        ))
+
+    def list_files(self, directory):
+        if not default_storage.exists(directory):
+            return []
+        return [
+            os.path.join(directory, name)
+            for name in default_storage.listdir(directory)[1]
+        ]
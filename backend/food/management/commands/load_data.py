@@ -1,18 +1,90 @@
 import csv
+import json
+import os
+import time
 
-from django.core.management import BaseCommand
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from food.cache import bump_catalogue
 from food.models import Product
 
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
 
 class Command(BaseCommand):
+    help = 'Загружает продукты из ingredients.csv или ingredients.json.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=DEFAULT_PATH)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать новые продукты, ничего не записывая.'
+        )
 
     def handle(self, *args, **options):
-        print('Начинаем загрузку данных')
-        with open('./data/ingredients.csv') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                print(row[0])
-                _, created = Product.objects.get_or_create(
-                    name=row[0],
-                    measurement_unit=row[1],
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+        batch_size = options['batch_size']
+        start = time.perf_counter()
+        self.stdout.write(f'Начинаем загрузку данных из {path}')
+
+        existing = set(
+            Product.objects.values_list('name', 'measurement_unit')
+        )
+        seen = set()
+        new_products = []
+        total = 0
+        with open(path, encoding='utf-8') as file:
+            for name, unit in reader(file):
+                total += 1
+                key = (name.strip(), unit.strip())
+                if key in seen or key in existing:
+                    continue
+                seen.add(key)
+                new_products.append(
+                    Product(name=key[0], measurement_unit=key[1])
                 )
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                for offset in range(0, len(new_products), batch_size):
+                    Product.objects.bulk_create(
+                        new_products[offset:offset + batch_size],
+                        ignore_conflicts=True
+                    )
+                    written = min(offset + batch_size, len(new_products))
+                    self.stdout.write(
+                        f'Записано {written} из {len(new_products)}'
+                    )
+            bump_catalogue('products')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {total}, новых продуктов: {len(new_products)}, '
+            f'пропущено: {total - len(new_products)}'
+            f'{" (пробный запуск)" if options["dry_run"] else ""}. '
+            f'Время: {elapsed:.2f} с, {total / elapsed:.0f} строк/с'
+        ))
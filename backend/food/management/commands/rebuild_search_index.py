@@ -0,0 +1,12 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from food.search import refresh_search
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковые векторы всех рецептов.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            refresh_search()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс обновлен'))
@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from food.counters import recount
+from food.models import Recipe, ShoppingCart, Subscription
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики избранного, корзин, рецептов '
+            'и подписчиков по фактическим данным.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount(Recipe, get_user_model(), Subscription, ShoppingCart)
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
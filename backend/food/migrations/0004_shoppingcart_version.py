@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0003_auto_20220620_1905'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия состава'),
+        ),
+    ]
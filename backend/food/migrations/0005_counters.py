@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('*')
+            ).values('total')
+        ),
+        Value(0)
+    )
+
+
+def fill_counters(apps, schema_editor):
+    # Логика food.counters.recount на момент миграции, на исторических
+    # моделях.
+    recipe = apps.get_model('food', 'Recipe')
+    cart = apps.get_model('food', 'ShoppingCart')
+    recipe.objects.update(
+        favorites_count=count_related(recipe.favorites.through, 'recipe_id'),
+        in_carts_count=count_related(cart.recipes.through, 'recipe_id')
+    )
+    apps.get_model(*settings.AUTH_USER_MODEL.split('.')).objects.update(
+        recipes_count=count_related(recipe, 'author_id'),
+        subscribers_count=count_related(
+            apps.get_model('food', 'Subscription'), 'author_id'
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0004_shoppingcart_version'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в корзину'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
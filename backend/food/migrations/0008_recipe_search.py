@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:00
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия запроса из food.search на момент миграции: код приложения может
+# измениться, а миграция должна работать со схемой этого шага.
+FILL_VECTORS_SQL = '''
+    INSERT INTO food_recipesearch (recipe_id, vector)
+    SELECT recipe.id,
+        setweight(to_tsvector('russian'::regconfig, recipe.name), 'A')
+        || setweight(to_tsvector('russian'::regconfig, coalesce((
+            SELECT string_agg(product.name, ' ')
+            FROM food_ingredient ingredient
+            JOIN food_product product ON product.id = ingredient.product_id
+            WHERE ingredient.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian'::regconfig, recipe.text), 'C')
+    FROM food_recipe recipe
+    ON CONFLICT (recipe_id) DO UPDATE SET vector = EXCLUDED.vector
+'''
+
+
+def create_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx '
+            'ON food_recipesearch USING gin (vector)'
+        )
+        schema_editor.execute(FILL_VECTORS_SQL)
+
+
+def drop_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0007_recipe_image_variants_ready'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearch',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='food.Recipe', verbose_name='Рецепт')),
+                ('vector', django.contrib.postgres.search.SearchVectorField(null=True, verbose_name='Поисковый вектор')),
+            ],
+            options={
+                'verbose_name': 'Поисковый вектор',
+                'verbose_name_plural': 'Поисковые векторы',
+            },
+        ),
+        migrations.RunPython(create_vector_index, drop_vector_index),
+    ]
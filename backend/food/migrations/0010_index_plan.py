@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+# Промежуточные таблицы M2M создаются Django автоматически, поэтому
+# составные индексы для них задаются SQL.
+THROUGH_INDEXES = [
+    # Фильтр is_favorited: рецепты пользователя без чтения строк таблицы.
+    ('recipe_favorites_user_recipe_idx', 'food_recipe_favorites',
+     'customuser_id, recipe_id'),
+    # Фильтр по тегам: id рецептов берутся прямо из индекса.
+    ('recipe_tags_tag_recipe_idx', 'food_recipe_tags', 'tag_id, recipe_id'),
+    # Покрывающий индекс для exists() в is_in_shopping_cart.
+    ('cart_recipes_recipe_cart_idx', 'food_shoppingcart_recipes',
+     'recipe_id, shoppingcart_id'),
+]
+
+
+def create_product_trigram_index(apps, schema_editor):
+    # Поиск продуктов идет по name__icontains, B-tree для него бесполезен.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX product_name_trgm_idx '
+            'ON food_product USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def drop_product_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0009_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-published', '-id'], name='recipe_author_published_idx'),
+        ),
+        *(
+            migrations.RunSQL(
+                f'CREATE INDEX {name} ON {table} ({columns})',
+                f'DROP INDEX {name}'
+            )
+            for name, table, columns in THROUGH_INDEXES
+        ),
+        migrations.RunPython(
+            create_product_trigram_index, drop_product_trigram_index
+        ),
+    ]
@@ -1,11 +1,32 @@
+from collections import defaultdict
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (MaxLengthValidator, MaxValueValidator,
                                     MinLengthValidator, MinValueValidator)
 from django.db import models
+from django.db.models import BooleanField, Exists, F, OuterRef, Value, Window
+from django.db.models.functions import RowNumber
 
 user = get_user_model()
 
 
+def annotate_subscription(queryset, cur_user):
+    """Добавляет к выборке пользователей флаг подписки cur_user."""
+    if not cur_user.is_authenticated:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(
+                author_id=OuterRef('pk'),
+                subscriber_id=cur_user.id
+            )
+        )
+    )
+
+
 class Tag(models.Model):
     name = models.CharField('Название', max_length=30, unique=True)
     color = models.CharField(
@@ -44,6 +65,64 @@ class Product(models.Model):
         return f'{self.name} {self.measurement_unit}'
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, cur_user):
+        """Аннотирует флаги избранного и корзины для пользователя."""
+        if not cur_user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Recipe.favorites.through.objects.filter(
+                    recipe_id=OuterRef('pk'),
+                    customuser_id=cur_user.id
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.recipes.through.objects.filter(
+                    recipe_id=OuterRef('pk'),
+                    shoppingcart__customer_id=cur_user.id
+                )
+            )
+        )
+
+    def latest_by_author(self, author_ids, limit=None):
+        """Возвращает словарь {id автора: последние рецепты} одним запросом.
+
+        При заданном limit рецепты каждого автора отбираются оконной
+        функцией ROW_NUMBER() прямо в базе.
+        """
+        recipes = defaultdict(list)
+        if not author_ids:
+            return recipes
+        queryset = self.filter(author_id__in=author_ids)
+        if limit is None:
+            queryset = queryset.order_by('-published')
+        else:
+            ranked = queryset.annotate(
+                recipe_rank=Window(
+                    expression=RowNumber(),
+                    partition_by=[F('author_id')],
+                    order_by=F('published').desc()
+                )
+            ).values(
+                'id', 'author_id', 'name', 'image', 'image_variants_ready',
+                'cooking_time', 'recipe_rank'
+            )
+            sql, params = ranked.query.sql_with_params()
+            queryset = self.raw(
+                f'SELECT * FROM ({sql}) ranked'
+                f' WHERE recipe_rank <= %s ORDER BY recipe_rank',
+                [*params, limit]
+            )
+        for recipe in queryset:
+            recipes[recipe.author_id].append(recipe)
+        return recipes
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         user, on_delete=models.CASCADE,
@@ -56,6 +135,11 @@ class Recipe(models.Model):
         'Обложка',
         upload_to='recipes/images'
     )
+    image_variants_ready = models.BooleanField(
+        'Уменьшенные копии обложки готовы',
+        default=False,
+        editable=False
+    )
     text = models.TextField('Описание', max_length=1000)
     ingredients = models.ManyToManyField(
         Product,
@@ -78,10 +162,32 @@ class Recipe(models.Model):
         related_name='favorites',
         blank=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлений в корзину',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-published', '-id'],
+                name='recipe_published_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-published', '-id'],
+                name='recipe_author_published_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.name} {self.author.username}'
@@ -140,12 +246,37 @@ class Subscription(models.Model):
             models.UniqueConstraint(fields=['author', 'subscriber'],
                                     name='unique_author_subscriber')
         ]
+        indexes = [
+            models.Index(
+                fields=['subscriber', 'author'],
+                name='subscription_subscriber_idx'
+            ),
+        ]
 
     def __str__(self):
         return (f'Подписка - автор: {self.author.email}'
                 f', подписчик: {self.subscriber.email}')
 
 
+class RecipeSearch(models.Model):
+    """Поисковый вектор рецепта для полнотекстового поиска в PostgreSQL.
+
+    Хранится отдельно, чтобы не тянуть вектор в каждую выборку рецептов.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search',
+        verbose_name='Рецепт'
+    )
+    vector = SearchVectorField('Поисковый вектор', null=True)
+
+    class Meta:
+        verbose_name = 'Поисковый вектор'
+        verbose_name_plural = 'Поисковые векторы'
+
+
 class ShoppingCart(models.Model):
     customer = models.OneToOneField(
         user,
@@ -159,6 +290,11 @@ class ShoppingCart(models.Model):
         blank=True,
         verbose_name='Рецепты'
     )
+    version = models.PositiveIntegerField(
+        'Версия состава',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['id']
@@ -171,3 +307,65 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'Корзина {self.customer.username}'
+
+
+class RecipeSimilarity(models.Model):
+    """Ближайшие соседи рецепта по совместным добавлениям.
+
+    Таблица целиком пересобирается командой build_recommendations, поэтому
+    ссылки на рецепты без ограничений в БД: удаление рецепта не трогает
+    таблицу, а удаленные соседи пропускаются при чтении.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similarity_recipe_score_idx'
+            ),
+        ]
+
+
+class Recommendation(models.Model):
+    """Рецепты, рекомендованные пользователю по его избранному и корзине."""
+    user = models.ForeignKey(
+        user,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='recommendation_user_score_idx'
+            ),
+        ]
@@ -0,0 +1,107 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.db import transaction
+
+from .models import Recipe, RecipeSimilarity, Recommendation, ShoppingCart
+
+WRITE_BATCH_SIZE = 1000
+
+
+def load_interactions():
+    """Возвращает {id пользователя: множество рецептов} по избранному
+    и корзинам."""
+    items = defaultdict(set)
+    favorites = Recipe.favorites.through.objects.values_list(
+        'customuser_id', 'recipe_id'
+    )
+    carts = ShoppingCart.recipes.through.objects.values_list(
+        'shoppingcart__customer_id', 'recipe_id'
+    )
+    for queryset in (favorites, carts):
+        for user_id, recipe_id in queryset.iterator():
+            items[user_id].add(recipe_id)
+    return items
+
+
+def build_neighbours(items, top_k, max_user_items):
+    """Косинусное сходство рецептов по совместным добавлениям.
+
+    Разреженная матрица совпадений копится словарями только по парам,
+    которые встретились хотя бы у одного пользователя; у каждого рецепта
+    остаются top_k соседей. Пользователи с очень длинными списками дают
+    квадратичное число пар и мало сигнала, поэтому пропускаются.
+    """
+    popularity = Counter()
+    co_occurrence = defaultdict(Counter)
+    for recipes in items.values():
+        popularity.update(recipes)
+        if len(recipes) > max_user_items:
+            continue
+        for first, second in combinations(sorted(recipes), 2):
+            co_occurrence[first][second] += 1
+            co_occurrence[second][first] += 1
+    neighbours = {}
+    for recipe_id, counts in co_occurrence.items():
+        neighbours[recipe_id] = heapq.nlargest(top_k, (
+            (count / math.sqrt(popularity[recipe_id] * popularity[other]),
+             other)
+            for other, count in counts.items()
+        ))
+    return neighbours
+
+
+def build_recommendations(items, neighbours, top_n):
+    """Для каждого пользователя суммирует сходство соседей его рецептов,
+    исключая уже добавленные."""
+    recommendations = {}
+    for user_id, recipes in items.items():
+        scores = defaultdict(float)
+        for recipe_id in recipes:
+            for score, other in neighbours.get(recipe_id, ()):
+                if other not in recipes:
+                    scores[other] += score
+        if scores:
+            recommendations[user_id] = heapq.nlargest(
+                top_n, ((score, other) for other, score in scores.items())
+            )
+    return recommendations
+
+
+def rebuild(top_k=20, top_n=50, max_user_items=500):
+    """Пересобирает обе таблицы и возвращает число пользователей,
+    рецептов с соседями и пользователей с рекомендациями."""
+    items = load_interactions()
+    neighbours = build_neighbours(items, top_k, max_user_items)
+    recommendations = build_recommendations(items, neighbours, top_n)
+    store(neighbours, recommendations)
+    return len(items), len(neighbours), len(recommendations)
+
+
+@transaction.atomic
+def store(neighbours, recommendations):
+    RecipeSimilarity.objects.all().delete()
+    Recommendation.objects.all().delete()
+    _bulk_write(RecipeSimilarity, (
+        RecipeSimilarity(recipe_id=recipe_id, similar_id=other, score=score)
+        for recipe_id, similar in neighbours.items()
+        for score, other in similar
+    ))
+    _bulk_write(Recommendation, (
+        Recommendation(user_id=user_id, recipe_id=recipe_id, score=score)
+        for user_id, recipes in recommendations.items()
+        for score, recipe_id in recipes
+    ))
+
+
+def _bulk_write(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == WRITE_BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
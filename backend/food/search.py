@@ -0,0 +1,228 @@
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              IntegerField, Q, Value, When)
+
+from .models import Ingredient, Product, Recipe
+
+PRODUCT_INDEX_TTL = 300
+AUTOCOMPLETE_LIMIT = 50
+RECIPE_INDEX_TTL = 300
+SEARCH_CONFIG = 'russian'
+# Веса полей рецепта: A/B/C в PostgreSQL и их аналоги в памяти.
+SEARCH_WEIGHTS = {'name': 4, 'ingredients': 2, 'text': 1}
+REFRESH_VECTORS_SQL = '''
+    INSERT INTO food_recipesearch (recipe_id, vector)
+    SELECT recipe.id,
+        setweight(to_tsvector(%(config)s::regconfig, recipe.name), 'A')
+        || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+            SELECT string_agg(product.name, ' ')
+            FROM food_ingredient ingredient
+            JOIN food_product product ON product.id = ingredient.product_id
+            WHERE ingredient.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%(config)s::regconfig, recipe.text), 'C')
+    FROM food_recipe recipe
+    {where}
+    ON CONFLICT (recipe_id) DO UPDATE SET vector = EXCLUDED.vector
+'''
+
+
+class ProductIndex:
+    """Неизменяемый индекс продуктов, отсортированный по названию.
+
+    Совпадения по началу названия ищутся бинарным поиском, совпадения
+    внутри названия добавляются следом, в том же алфавитном порядке.
+    """
+
+    def __init__(self, products):
+        rows = sorted(
+            (name.lower(), name, pk, unit) for pk, name, unit in products
+        )
+        self.keys = tuple(row[0] for row in rows)
+        self.items = tuple(
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, name, pk, unit in rows
+        )
+        self.built = time.monotonic()
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        query = query.strip().lower()
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + '\U0010ffff', start)
+        result = list(self.items[start:min(end, start + limit)])
+        if len(result) == limit:
+            return result
+        for num, key in enumerate(self.keys):
+            if query in key and not start <= num < end:
+                result.append(self.items[num])
+                if len(result) == limit:
+                    break
+        return result
+
+
+_product_index = None
+
+
+def get_product_index():
+    global _product_index
+    index = _product_index
+    if index is None or time.monotonic() - index.built > PRODUCT_INDEX_TTL:
+        index = ProductIndex(
+            Product.objects.values_list('id', 'name', 'measurement_unit')
+        )
+        _product_index = index
+    return index
+
+
+def reset_product_index():
+    global _product_index
+    _product_index = None
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.lower())
+
+
+class RecipeIndex:
+    """Обратный индекс рецептов в памяти для баз без полнотекстового поиска.
+
+    Слово запроса совпадает со всеми словами индекса, которые с него
+    начинаются (точное совпадение весит вдвое больше). Рецепт должен
+    содержать все слова запроса, ранг — сумма весов полей, где они нашлись.
+    """
+
+    def __init__(self, recipes, ingredients):
+        postings = defaultdict(lambda: defaultdict(int))
+        for pk, name, text in recipes:
+            for token in tokenize(name):
+                postings[token][pk] += SEARCH_WEIGHTS['name']
+            for token in tokenize(text):
+                postings[token][pk] += SEARCH_WEIGHTS['text']
+        for recipe_id, product_name in ingredients:
+            for token in tokenize(product_name):
+                postings[token][recipe_id] += SEARCH_WEIGHTS['ingredients']
+        self.tokens = tuple(sorted(postings))
+        self.postings = tuple(dict(postings[token]) for token in self.tokens)
+        self.built = time.monotonic()
+
+    def search(self, query):
+        """Возвращает словарь {id рецепта: ранг}."""
+        ranks = None
+        for term in tokenize(query):
+            scores = defaultdict(int)
+            start = bisect_left(self.tokens, term)
+            end = bisect_left(self.tokens, term + '\U0010ffff', start)
+            for num in range(start, end):
+                factor = 2 if self.tokens[num] == term else 1
+                for pk, weight in self.postings[num].items():
+                    scores[pk] += weight * factor
+            if ranks is None:
+                ranks = scores
+            else:
+                ranks = {
+                    pk: rank + scores[pk]
+                    for pk, rank in ranks.items() if pk in scores
+                }
+        return ranks or {}
+
+
+_recipe_index = None
+
+
+def get_recipe_index():
+    global _recipe_index
+    index = _recipe_index
+    if index is None or time.monotonic() - index.built > RECIPE_INDEX_TTL:
+        index = RecipeIndex(
+            Recipe.objects.values_list('id', 'name', 'text'),
+            Ingredient.objects.values_list('recipe_id', 'product__name')
+        )
+        _recipe_index = index
+    return index
+
+
+def reset_recipe_index():
+    global _recipe_index
+    _recipe_index = None
+
+
+def refresh_search(recipe_ids=None):
+    """Пересчитывает поисковые векторы рецептов (всех, если ids не заданы).
+
+    В PostgreSQL это один INSERT ... ON CONFLICT, индекс в памяти
+    просто сбрасывается и собирается заново при следующем поиске.
+    """
+    if connection.vendor == 'postgresql':
+        params = {'config': SEARCH_CONFIG}
+        where = ''
+        if recipe_ids is not None:
+            where = 'WHERE recipe.id = ANY(%(ids)s)'
+            params['ids'] = list(recipe_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(REFRESH_VECTORS_SQL.format(where=where), params)
+    transaction.on_commit(reset_recipe_index)
+
+
+def refresh_search_on_commit(recipe_ids):
+    """Пересчитывает векторы рецептов после фиксации транзакции, когда
+    ингредиенты рецепта уже сохранены."""
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: refresh_search(recipe_ids))
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует их по релевантности."""
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        return queryset.filter(search__vector=search_query).annotate(
+            search_rank=SearchRank(F('search__vector'), search_query)
+        ).order_by('-search_rank', '-published', '-id')
+
+    ranks = get_recipe_index().search(query)
+    if not ranks:
+        return queryset.none()
+    by_rank = defaultdict(list)
+    for pk, rank in ranks.items():
+        by_rank[rank].append(pk)
+    return queryset.filter(pk__in=list(ranks)).annotate(
+        search_rank=Case(
+            *[When(pk__in=ids, then=Value(rank))
+              for rank, ids in by_rank.items()],
+            output_field=IntegerField()
+        )
+    ).order_by('-search_rank', '-published', '-id')
+
+
+def match_products(product_ids, max_missing=None):
+    """Ранжирует рецепты по доле ингредиентов, которые есть в product_ids.
+
+    Один агрегирующий запрос по таблице ингредиентов: рассматриваются
+    только рецепты, где есть хотя бы один из продуктов. Возвращает строки
+    с recipe_id, coverage (доля от 0 до 1) и missing (сколько не хватает),
+    лучшие совпадения первыми.
+    """
+    candidates = Ingredient.objects.filter(
+        product_id__in=product_ids
+    ).values('recipe_id')
+    matches = Ingredient.objects.filter(
+        recipe_id__in=candidates
+    ).values('recipe_id').annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(product_id__in=product_ids)),
+    ).annotate(
+        missing=F('total') - F('present'),
+        coverage=ExpressionWrapper(
+            F('present') * 1.0 / F('total'), output_field=FloatField()
+        ),
+    )
+    if max_missing is not None:
+        matches = matches.filter(missing__lte=max_missing)
+    return matches.values('recipe_id', 'coverage', 'missing').order_by(
+        '-coverage', 'missing', '-recipe_id'
+    )
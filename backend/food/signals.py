@@ -0,0 +1,235 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .cache import (FEED_TAG, author_tag, bump_cart_versions, bump_catalogue,
+                    bump_response_tags, forget_user_ids, recipe_tag)
+from .counters import shift_counter
+from .images import schedule_cleanup
+from .models import (Ingredient, Product, Recipe, ShoppingCart, Subscription,
+                     Tag)
+from .search import (refresh_search, refresh_search_on_commit,
+                     reset_product_index)
+
+user = get_user_model()
+
+LINK_DELTAS = {'post_add': 1, 'post_remove': -1}
+LINK_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+SEARCH_FIELDS = {'name', 'text'}
+
+
+def shift_link_counter(instance, action, pk_set, field, links, recipe_side):
+    """Сдвигает счетчик field рецептов при изменении связи M2M.
+
+    links — связанные с instance объекты. Если instance — рецепт
+    (recipe_side), pk_set содержит id другой стороны связи, иначе id
+    рецептов. При add() в pk_set попадают только новые связи.
+    """
+    if action == 'pre_clear':
+        # После clear() связанные объекты уже не узнать.
+        instance._cleared_links = list(links.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set, delta = instance._cleared_links, -1
+    elif action in LINK_DELTAS:
+        delta = LINK_DELTAS[action]
+    else:
+        return
+    if recipe_side:
+        shift_counter(Recipe, [instance.pk], field, delta * len(pk_set))
+    else:
+        shift_counter(Recipe, pk_set, field, delta)
+
+
+@receiver(m2m_changed, sender=Recipe.favorites.through)
+def favorites_counter_changed(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    shift_link_counter(
+        instance, action, pk_set, 'favorites_count', instance.favorites,
+        recipe_side=not reverse
+    )
+
+
+@receiver(m2m_changed, sender=ShoppingCart.recipes.through)
+def cart_counter_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    shift_link_counter(
+        instance, action, pk_set, 'in_carts_count',
+        instance.shopping_carts if reverse else instance.recipes,
+        recipe_side=reverse
+    )
+
+
+def changed_links(instance, action, pk_set):
+    """id другой стороны связи, затронутые add(), remove() или clear()."""
+    if action == 'post_clear':
+        return instance._cleared_links
+    return pk_set
+
+
+# Множества id для накладки флагов на кэш страниц сбрасываются здесь, а не
+# во вьюхах, чтобы правки в админке тоже их обновляли.
+@receiver(m2m_changed, sender=Recipe.favorites.through)
+def favorite_ids_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    if action not in LINK_ACTIONS:
+        return
+    user_ids = (
+        [instance.pk] if reverse
+        else changed_links(instance, action, pk_set)
+    )
+    for user_id in user_ids:
+        forget_user_ids(user_id, 'favorites')
+
+
+@receiver(m2m_changed, sender=ShoppingCart.recipes.through)
+def cart_ids_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in LINK_ACTIONS:
+        return
+    customer_ids = (
+        ShoppingCart.objects.filter(
+            pk__in=changed_links(instance, action, pk_set)
+        ).values_list('customer_id', flat=True) if reverse
+        else [instance.customer_id]
+    )
+    for customer_id in customer_ids:
+        forget_user_ids(customer_id, 'shopping_cart')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_counted(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(user, [instance.author_id], 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_uncounted(sender, instance, **kwargs):
+    shift_counter(user, [instance.author_id], 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_counted(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(user, [instance.author_id], 'subscribers_count', 1)
+        forget_user_ids(instance.subscriber_id, 'subscriptions')
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_uncounted(sender, instance, **kwargs):
+    shift_counter(user, [instance.author_id], 'subscribers_count', -1)
+    forget_user_ids(instance.subscriber_id, 'subscriptions')
+
+
+@receiver(m2m_changed, sender=ShoppingCart.recipes.through)
+def cart_recipes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_cart_versions(pk=instance.pk)
+        return
+    if action in ('post_add', 'post_remove'):
+        bump_cart_versions(pk__in=pk_set)
+    elif action == 'pre_clear':
+        instance._cleared_cart_ids = list(
+            instance.shopping_carts.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        bump_cart_versions(pk__in=instance._cleared_cart_ids)
+
+
+@receiver(m2m_changed, sender=Ingredient)
+def recipe_ingredients_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_') and not reverse:
+        bump_cart_versions(recipes=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    bump_cart_versions(recipes=instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    bump_cart_versions(recipes=instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_orphaned(sender, instance, **kwargs):
+    schedule_cleanup(instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_response_changed(sender, instance, **kwargs):
+    bump_response_tags(FEED_TAG, recipe_tag(instance.pk))
+
+
+# Без post_delete: иначе удаление рецепта выбирало бы его ингредиенты
+# поштучно, а сам рецепт и так сбрасывает свои теги.
+@receiver(post_save, sender=Ingredient)
+def ingredient_response_changed(sender, instance, **kwargs):
+    bump_response_tags(FEED_TAG, recipe_tag(instance.recipe_id))
+
+
+# Теги рецепта меняются вместе с самим рецептом в одной транзакции, и его
+# post_save уже сбрасывает кэш. Обработчик m2m_changed на Recipe.tags
+# лишил бы удаление рецепта быстрого DELETE по связям.
+@receiver(m2m_changed, sender=Ingredient)
+def recipe_products_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        bump_response_tags(FEED_TAG, 'products')
+    else:
+        bump_response_tags(FEED_TAG, recipe_tag(instance.pk))
+
+
+# Поисковый вектор обновляется здесь, а не в сериализаторе, чтобы правки
+# в админке и из кода тоже попадали в поиск.
+@receiver(post_save, sender=Recipe)
+def recipe_search_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        refresh_search_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_search_changed(sender, instance, **kwargs):
+    refresh_search_on_commit([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Ingredient)
+def recipe_products_searched(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in LINK_ACTIONS:
+        return
+    if not reverse:
+        refresh_search_on_commit([instance.pk])
+    elif pk_set:
+        refresh_search_on_commit(pk_set)
+
+
+@receiver(post_save, sender=user)
+def author_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_response_tags(FEED_TAG, author_tag(instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def product_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_cart_versions(recipes__ingredients=instance)
+        refresh_search(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_index_changed(sender, instance, **kwargs):
+    reset_product_index()
+    bump_catalogue('products')
+    bump_response_tags('products')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_catalogue('tags')
+    bump_response_tags('tags')
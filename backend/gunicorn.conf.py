@@ -0,0 +1,10 @@
+import os
+
+from backend.settings import WEB_WORKERS
+
+bind = '0:8000'
+# Каждый поток воркера держит свое постоянное соединение с БД, поэтому
+# соединений с базой не больше WEB_WORKERS * WEB_THREADS (плюс потоки
+# обработки картинок, IMAGE_WORKERS на процесс).
+workers = WEB_WORKERS
+threads = int(os.getenv('WEB_THREADS', 1))
@@ -0,0 +1,38 @@
+import pytest
+from api import benchmark
+from django.core.cache import cache
+from food.search import reset_product_index, reset_recipe_index
+from rest_framework.test import APIClient
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(settings, tmp_path):
+    """Кэш Django и индексы в памяти не переживают тест."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    cache.clear()
+    reset_product_index()
+    reset_recipe_index()
+    yield
+    cache.clear()
+    reset_product_index()
+    reset_recipe_index()
+
+
+@pytest.fixture
+def main_user(db):
+    return benchmark.seed(
+        users=30, recipes=40, products=30, subscriptions_per_user=5,
+        favorites_per_user=5, cart_size=4
+    )
+
+
+@pytest.fixture
+def client(main_user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {main_user.auth_token.key}')
+    return client
+
+
+@pytest.fixture
+def anonymous():
+    return APIClient()
@@ -0,0 +1,34 @@
+import pytest
+from api.authentication import TokenCache
+from rest_framework.authtoken.models import Token
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def test_deleted_token_evicted_in_other_process(main_user):
+    """Локальный LRU другого процесса сверяет версию токена в общем кэше."""
+    other = TokenCache(size=16, ttl=60, shared=False)
+    token = main_user.auth_token
+    other.set(token.key, token, other.get(token.key)[1])
+    assert other.get(token.key)[0] is not None
+    Token.objects.filter(pk=token.pk).delete()
+    assert other.get(token.key)[0] is None
+
+
+def test_logout_rejects_token(client):
+    assert client.get('/api/users/me/').status_code == 200
+    assert client.post('/api/auth/token/logout/').status_code == 204
+    assert client.get('/api/users/me/').status_code == 401
+
+
+def test_deactivated_user_rejected(main_user, client):
+    assert client.get('/api/users/me/').status_code == 200
+    main_user.is_active = False
+    main_user.save()
+    assert client.get('/api/users/me/').status_code == 401
+
+
+def test_deleted_user_rejected(main_user, client):
+    assert client.get('/api/users/me/').status_code == 200
+    main_user.delete()
+    assert client.get('/api/users/me/').status_code == 401
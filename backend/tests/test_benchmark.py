@@ -0,0 +1,18 @@
+import io
+
+from api import benchmark
+from api.management.commands.benchmark_api import DEFAULT_BASELINE, Command
+
+
+def test_query_counts_within_baseline(transactional_db):
+    """Число запросов к БД по эндпоинтам не выросло.
+
+    Время ответа на машинах CI шумит, поэтому сравниваются только статусы
+    и число запросов. Три повтора нужны, чтобы последний замер шел уже с
+    прогретым кэшем, как при записи базовой линии.
+    """
+    results = Command(stdout=io.StringIO()).run_benchmark({
+        'users': 30, 'recipes': 60, 'products': 40, 'repeat': 3,
+    })
+    baseline = benchmark.load_baseline(DEFAULT_BASELINE)
+    assert benchmark.compare(results, baseline) == []
@@ -0,0 +1,60 @@
+import pytest
+from food.models import Recipe, ShoppingCart
+
+BULK_URLS = {
+    'favorites_count': '/api/recipes/favorite/',
+    'in_carts_count': '/api/recipes/shopping_cart/',
+}
+LINKS = {
+    'favorites_count': Recipe.favorites.through,
+    'in_carts_count': ShoppingCart.recipes.through,
+}
+
+
+def true_count(field, recipe_id):
+    return LINKS[field].objects.filter(recipe_id=recipe_id).count()
+
+
+def free_recipes(user, count):
+    return list(Recipe.objects.exclude(favorites=user).exclude(
+        shopping_carts__customer=user
+    ).values_list('pk', flat=True)[:count])
+
+
+@pytest.mark.parametrize('field', BULK_URLS)
+def test_bulk_add_and_remove(client, main_user, field):
+    recipe_ids = free_recipes(main_user, 3)
+    response = client.post(
+        BULK_URLS[field], {'recipes': recipe_ids + [10 ** 6]}, format='json'
+    )
+    assert response.status_code == 200
+    assert [item['status'] for item in response.json()['results']] == [
+        'added', 'added', 'added', 'not_found'
+    ]
+    response = client.post(
+        BULK_URLS[field], {'recipes': recipe_ids[:1]}, format='json'
+    )
+    assert response.json()['results'] == [
+        {'id': recipe_ids[0], 'status': 'exists'}
+    ]
+    response = client.delete(
+        BULK_URLS[field], {'recipes': recipe_ids[:2]}, format='json'
+    )
+    assert [item['status'] for item in response.json()['results']] == [
+        'removed', 'removed'
+    ]
+    for recipe in Recipe.objects.filter(pk__in=recipe_ids):
+        assert getattr(recipe, field) == true_count(field, recipe.pk)
+
+
+@pytest.mark.parametrize('field', BULK_URLS)
+def test_bulk_counters_follow_rows(client, main_user, field):
+    """Счетчик пересчитывается по строкам связи, даже если разошелся."""
+    recipe_ids = free_recipes(main_user, 2)
+    Recipe.objects.filter(pk__in=recipe_ids).update(**{field: 100})
+    client.post(BULK_URLS[field], {'recipes': recipe_ids}, format='json')
+    for recipe in Recipe.objects.filter(pk__in=recipe_ids):
+        assert getattr(recipe, field) == true_count(field, recipe.pk)
+    client.delete(BULK_URLS[field], {'recipes': recipe_ids}, format='json')
+    for recipe in Recipe.objects.filter(pk__in=recipe_ids):
+        assert getattr(recipe, field) == true_count(field, recipe.pk)
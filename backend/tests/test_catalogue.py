@@ -0,0 +1,43 @@
+import gzip
+import json
+
+from django.db import transaction
+from food.cache import get_catalogue
+from food.models import Tag
+
+
+def build_tags():
+    return list(Tag.objects.values_list('slug', flat=True))
+
+
+def test_catalogue_changes_after_commit(transactional_db):
+    """До фиксации справочник собирается из старых данных и не должен
+    попасть в кэш под новой версией."""
+    data, etag, modified = get_catalogue('tags', build_tags)
+    with transaction.atomic():
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        assert get_catalogue('tags', build_tags) == (data, etag, modified)
+    data, _, new_modified = get_catalogue('tags', build_tags)
+    assert new_modified != modified
+    assert data == ['breakfast']
+
+
+def test_tags_not_modified(db, anonymous):
+    Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    response = anonymous.get('/api/tags/')
+    assert response.status_code == 200
+    response = anonymous.get(
+        '/api/tags/', HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == 304
+    assert response.content == b''
+
+
+def test_large_response_compressed(client):
+    response = client.get(
+        '/api/recipes/?limit=40', HTTP_ACCEPT_ENCODING='gzip'
+    )
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response['Vary']
+    data = json.loads(gzip.decompress(response.content))
+    assert len(data['results']) == 40
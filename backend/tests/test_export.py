@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+
+import pytest
+from food.cache import get_cart_products
+
+
+def download(client, export_format):
+    response = client.get(
+        f'/api/recipes/download_shopping_cart/?format={export_format}'
+    )
+    return response, b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.parametrize('export_format, content_type', [
+    ('txt', 'text/plain'),
+    ('csv', 'text/csv'),
+    ('json', 'application/json'),
+])
+def test_export_formats(client, main_user, export_format, content_type):
+    response, content = download(client, export_format)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith(content_type)
+    assert response['Content-Disposition'].endswith(f'.{export_format}')
+    products = get_cart_products(main_user.shopping_cart)
+    assert products
+    if export_format == 'json':
+        assert len(json.loads(content)['ingredients']) == len(products)
+    elif export_format == 'csv':
+        assert len(list(csv.reader(io.StringIO(content)))) > len(products)
+    else:
+        assert all(name in content for name, _, _ in products)
+
+
+def test_unsupported_format(client):
+    response = client.get('/api/recipes/download_shopping_cart/?format=doc')
+    assert response.status_code == 400
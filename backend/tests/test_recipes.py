@@ -0,0 +1,77 @@
+import pytest
+from food.models import Ingredient, Recipe, RecipeSimilarity
+
+
+def test_cursor_pages_cover_feed(client):
+    """Страницы по курсору идут без пропусков и повторов."""
+    url, ids = '/api/recipes/?limit=7&cursor=', []
+    while url:
+        page = client.get(url).json()
+        assert set(page) == {'next', 'results'}
+        ids.extend(recipe['id'] for recipe in page['results'])
+        url = page['next']
+    assert ids == list(Recipe.objects.order_by(
+        '-published', '-id'
+    ).values_list('id', flat=True))
+
+
+def test_invalid_cursor(client):
+    assert client.get('/api/recipes/?cursor=abc').status_code == 404
+
+
+def test_cookable_ranks_full_match_first(client):
+    recipe = Recipe.objects.first()
+    product_ids = Ingredient.objects.filter(
+        recipe=recipe
+    ).values_list('product_id', flat=True)
+    query = '&'.join(f'products={pk}' for pk in product_ids)
+    response = client.get(f'/api/recipes/cookable/?{query}')
+    assert response.status_code == 200
+    first = response.json()['results'][0]
+    assert first['coverage'] == 1
+    assert first['missing_count'] == 0
+    assert recipe.pk in {
+        item['id'] for item in response.json()['results']
+        if item['coverage'] == 1
+    }
+
+
+@pytest.mark.parametrize('query', ['', 'products=abc'])
+def test_cookable_rejects_bad_products(client, query):
+    response = client.get(f'/api/recipes/cookable/?{query}')
+    assert response.status_code == 400
+
+
+def test_similar_excludes_recipe_itself(client):
+    recipe_id = RecipeSimilarity.objects.values_list(
+        'recipe_id', flat=True
+    ).first()
+    response = client.get(f'/api/recipes/{recipe_id}/similar/')
+    assert response.status_code == 200
+    ids = [item['id'] for item in response.json()['results']]
+    assert ids and recipe_id not in ids
+
+
+def test_recommended(client, anonymous, main_user):
+    response = client.get('/api/recipes/recommended/?limit=10')
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 10
+    assert anonymous.get('/api/recipes/recommended/').status_code == 401
+
+
+@pytest.mark.parametrize('action, field', [
+    ('favorite', 'favorites_count'),
+    ('shopping_cart', 'in_carts_count'),
+])
+def test_single_link_counters(client, main_user, action, field):
+    recipe = Recipe.objects.exclude(favorites=main_user).exclude(
+        shopping_carts__customer=main_user
+    ).first()
+    before = getattr(recipe, field)
+    url = f'/api/recipes/{recipe.pk}/{action}/'
+    assert client.post(url).status_code == 201
+    recipe.refresh_from_db()
+    assert getattr(recipe, field) == before + 1
+    assert client.delete(url).status_code == 204
+    recipe.refresh_from_db()
+    assert getattr(recipe, field) == before
@@ -0,0 +1,7 @@
+from api.management.commands.check_representations import Command
+
+
+def test_representations_match_serializers(db):
+    """Быстрые ответы на чтение совпадают с сериализаторами."""
+    options = {'users': 20, 'recipes': 40, 'products': 50}
+    assert Command().run(options) == []
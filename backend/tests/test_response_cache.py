@@ -0,0 +1,52 @@
+import pytest
+from food.models import Recipe
+
+
+@pytest.mark.parametrize('first, second', [
+    ('/api/recipes/?limit=6', '/api/recipes/?limit=6&cursor='),
+    ('/api/recipes/?limit=6&cursor=', '/api/recipes/?limit=6'),
+])
+def test_cursor_page_cached_apart_from_numbered(
+    settings, main_user, anonymous, first, second
+):
+    """Пустой cursor меняет вид страницы и не делит с ней запись кэша."""
+    settings.RESPONSE_CACHE_TIMEOUT = 60
+    responses = {url: anonymous.get(url).json() for url in (first, second)}
+    numbered = responses['/api/recipes/?limit=6']
+    keyset = responses['/api/recipes/?limit=6&cursor=']
+    assert set(numbered) == {'count', 'next', 'previous', 'results'}
+    assert set(keyset) == {'next', 'results'}
+    assert 'cursor=' in keyset['next']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cached_detail_follows_recipe_changes(settings, main_user,
+                                              anonymous):
+    settings.RESPONSE_CACHE_TIMEOUT = 60
+    recipe = Recipe.objects.first()
+    url = f'/api/recipes/{recipe.pk}/'
+    assert anonymous.get(url).json()['name'] == recipe.name
+    recipe.name = 'Новое название'
+    recipe.save()
+    assert anonymous.get(url).json()['name'] == 'Новое название'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_shared_page_gets_personal_flags(settings, main_user, client,
+                                         anonymous):
+    """Страница из общего кэша получает флаги текущего пользователя."""
+    settings.RESPONSE_CACHE_TIMEOUT = 60
+    url = '/api/recipes/?limit=6'
+    recipe = next(
+        recipe for recipe in anonymous.get(url).json()['results']
+        if not recipe['is_favorited']
+    )
+    client.post(f'/api/recipes/{recipe["id"]}/favorite/')
+    flags = {
+        item['id']: item['is_favorited']
+        for item in client.get(url).json()['results']
+    }
+    assert flags[recipe['id']] is True
+    assert not any(
+        item['is_favorited'] for item in anonymous.get(url).json()['results']
+    )
@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.mark.parametrize('limit, expected', [('2', 2), ('abc', None)])
+def test_subscriptions_recipes_limit(client, main_user, limit, expected):
+    """Нечисловой recipes_limit не ограничивает рецепты и не дает 500."""
+    response = client.get(
+        f'/api/users/subscriptions/?limit=50&recipes_limit={limit}'
+    )
+    assert response.status_code == 200
+    for author in response.json()['results']:
+        count = author['recipes_count']
+        assert len(author['recipes']) == min(count, expected or count)